@@ -0,0 +1 @@
+"""Headless command-line entry point: python -m aiopu --help"""
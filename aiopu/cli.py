@@ -0,0 +1,329 @@
+"""
+Headless CLI for the PDF and CryptIt pipelines. Never imports PySide6.
+
+Examples:
+    python -m aiopu pdf nup "scans/**/*.pdf" --pages-per-sheet 4 --json
+    python -m aiopu pdf nup handout.pdf --grid 3x3 --portrait --sheet-size Letter
+    python -m aiopu pdf tables statements/ --output tables.xlsx
+    python -m aiopu pdf backends sample.pdf --json
+    python -m aiopu pdf backends samples/ --apply
+    python -m aiopu crypt enc exports/ --key <fernet key>
+    python -m aiopu crypt rotate exports/ --key <old key> --new-key <new key>
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from functools import partial
+from config.logging_config import create_logging_config, get_current_log_file, LoggingManager, get_logger
+
+logger = get_logger(__name__)
+
+
+def expand_paths(patterns, extensions=None):
+    """
+    Yield files from a mix of file paths, glob patterns and directories. Directories are walked
+    with modules.os.iter_files, like folders dropped in the app.
+    extensions: optional tuple of lower-case suffixes to keep, e.g. ('.pdf',).
+    """
+    from modules.os import iter_files
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            yield from iter_files([pattern], extensions)
+        elif glob.has_magic(pattern):
+            for path in sorted(glob.iglob(pattern, recursive=True)):
+                if os.path.isfile(path) and (not extensions or os.path.splitext(path)[1].lower() in extensions):
+                    yield path
+        elif os.path.isfile(pattern):
+            yield pattern
+        else:
+            logger.warning(f"No such file or directory: {pattern}")
+
+
+class ResultPrinter:
+    """Stream one result per line to stdout, as JSON lines or plain text."""
+
+    def __init__(self, as_json):
+        self.as_json = as_json
+        self.succeeded = 0
+        self.failed = 0
+
+    def emit(self, path, output=None, error=None, seconds=0.0, **extra):
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+        if self.as_json:
+            record = {"input": path, "output": output, "ok": error is None, "error": error,
+                      "seconds": round(seconds, 3), **extra}
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        elif error is None:
+            print(f"OK    {path} -> {output}", flush=True)
+        else:
+            print(f"FAIL  {path}: {error}", flush=True)
+
+    def summary(self):
+        if self.as_json:
+            print(json.dumps({"summary": {"succeeded": self.succeeded, "failed": self.failed}}), flush=True)
+        else:
+            print(f"{self.succeeded} succeeded, {self.failed} failed", flush=True)
+        return 0 if self.failed == 0 else 1
+
+
+def run_each(paths, printer, func, map_func=None):
+    """
+    Call func(path) -> output for every path, reporting each result as it completes.
+    map_func(func, paths) may run the calls elsewhere (e.g. a process pool); it must yield
+    (path, output, error) in input order. Seconds are then the time since the previous result.
+    """
+    if map_func is None:
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                output = func(path)
+                printer.emit(path, output, seconds=time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Failed to process {path}: {e}", exc_info=True)
+                printer.emit(path, error=str(e), seconds=time.perf_counter() - start)
+        return printer.summary()
+
+    start = time.perf_counter()
+    for path, output, error in map_func(func, paths):
+        now = time.perf_counter()
+        printer.emit(path, output, error, seconds=now - start)
+        start = now
+    return printer.summary()
+
+
+def cmd_pdf_nup(args, printer):
+    from modules.pdf_layout import SheetLayout, parse_grid
+    from modules.utilities import create_pages_per_sheet_file, map_in_process_pool
+
+    grid = parse_grid(args.grid) if args.grid else None
+    pages_per_sheet = args.pages_per_sheet or (2 if args.booklet else grid[0] * grid[1] if grid else 4)
+    layout_options = dict(sheet_size=args.sheet_size, orientation="portrait" if args.portrait else "landscape",
+                          grid=grid, order="booklet" if args.booklet else "grid")
+    SheetLayout(pages_per_sheet, margin=args.margin, **layout_options)  # Reject a bad layout before any file
+
+    paths = list(expand_paths(args.paths, (".pdf",)))
+    process = partial(create_pages_per_sheet_file, pages_per_sheet=pages_per_sheet, margin=args.margin,
+                      output_dir=args.output_dir, optimize=not args.no_optimize,
+                      object_streams=not args.no_object_streams,
+                      **layout_options)
+    if len(paths) == 1:
+        # A single PDF is split into page ranges across the workers instead
+        return run_each(paths, printer, partial(process, max_workers=args.workers))
+    return run_each(paths, printer, process, partial(map_in_process_pool, max_workers=args.workers))
+
+
+def cmd_pdf_backends(args, printer):
+    from modules.pdf_backend import (benchmark_backends, combine_benchmarks, get_saved_backends_path,
+                                     reset_default_backends, set_default_backends)
+
+    if args.reset:
+        deleted = reset_default_backends()
+        print(f"{'Deleted' if deleted else 'No'} saved PDF backend order {get_saved_backends_path()}",
+              file=sys.stderr)
+        if not args.paths:
+            return 0
+    elif not args.paths:
+        print("No PDF files given.", file=sys.stderr)
+        return 1
+
+    benchmarks = []
+    for path in expand_paths(args.paths, (".pdf",)):
+        start = time.perf_counter()
+        try:
+            results = benchmark_backends(path, repeat=args.repeat)
+            benchmarks.append(results)
+            fastest = ", ".join(f"{operation}: {timings[0][1]}" for operation, timings in results.items())
+            printer.emit(path, fastest, seconds=time.perf_counter() - start,
+                         timings={operation: {name: round(seconds, 4) for seconds, name in timings}
+                                  for operation, timings in results.items()})
+        except Exception as e:
+            printer.emit(path, error=str(e), seconds=time.perf_counter() - start)
+
+    if args.apply and benchmarks:
+        # One order for all the sample files, from their total time per backend
+        start = time.perf_counter()
+        try:
+            order = set_default_backends(combine_benchmarks(benchmarks), save=True)
+            printer.emit(f"{len(benchmarks)} PDF files", get_saved_backends_path(),
+                         seconds=time.perf_counter() - start, order=order)
+        except OSError as e:
+            printer.emit(f"{len(benchmarks)} PDF files", error=f"Cannot save the backend order: {e}",
+                         seconds=time.perf_counter() - start)
+    return printer.summary()
+
+
+def cmd_pdf_tables(args, printer):
+    from modules.utilities import extract_tables_from_pdfs
+
+    pdf_paths = list(expand_paths(args.paths, (".pdf",)))
+    if not pdf_paths:
+        print("No PDF files found.", file=sys.stderr)
+        return 1
+
+    combine_files = not args.separate_files
+    start = time.perf_counter()
+    try:
+        extract_tables_from_pdfs(pdf_paths, args.output, combine_files, not args.separate_tables,
+                                 max_workers=args.workers, pages_per_chunk=args.pages_per_chunk)
+        printer.emit(f"{len(pdf_paths)} PDF files", args.output or os.path.dirname(pdf_paths[0]),
+                     seconds=time.perf_counter() - start, files=pdf_paths)
+    except Exception as e:
+        printer.emit(f"{len(pdf_paths)} PDF files", error=str(e), seconds=time.perf_counter() - start)
+    return printer.summary()
+
+
+def cmd_crypt(args, printer):
+    from modules.crypt_files import crypt_file, resolve_key, ENCRYPT, DECRYPT, CHUNKED, FERNET, FERNET_RAW
+    from modules.security import KDF_SCRYPT, KDF_PBKDF2, derived_keys, wipe_derived_keys
+
+    key = resolve_key(args.key)
+    kdf = KDF_SCRYPT if args.kdf == "scrypt" else KDF_PBKDF2
+    if args.action == "rotate":
+        return rotate_keys(args, printer, key, kdf)
+
+    action = ENCRYPT if args.action == "enc" else DECRYPT
+    fmt = {"chunked": CHUNKED, "fernet": FERNET, "fernet-raw": FERNET_RAW}[args.format]
+
+    def process(path):
+        save_path = crypt_file(path, key, action, fmt, kdf)
+        if save_path is None:
+            raise ValueError("No data found in file.")
+        return save_path
+
+    paths = expand_paths(args.paths)
+    map_func = None
+    if args.manifest is not None:
+        from modules.crypt_files import get_manifest_name, get_manifest_settings
+        from modules.manifest import map_with_manifest, default_manifest_path
+
+        paths = list(paths)
+        if not paths:
+            print("No files found.", file=sys.stderr)
+            return 1
+        map_func = map_with_manifest(args.manifest or default_manifest_path(paths, get_manifest_name(action)),
+                                     settings=get_manifest_settings(key, action, fmt))
+
+    try:
+        return run_each(paths, printer, process, map_func)
+    finally:
+        logger.info(f"Key derivations run: {derived_keys.derivations}")
+        wipe_derived_keys()
+
+
+def rotate_keys(args, printer, old_key, kdf):
+    from modules.crypt_files import rotate_file, map_with_journal, default_journal_path, ROTATION_JOURNAL_NAME
+    from modules.security import wipe_derived_keys
+    from modules.utilities import map_in_process_pool
+
+    if not args.new_key:
+        raise ValueError("crypt rotate needs --new-key.")
+    paths = [path for path in expand_paths(args.paths) if os.path.basename(path) != ROTATION_JOURNAL_NAME]
+    if not paths:
+        print("No files found.", file=sys.stderr)
+        return 1
+
+    journal_path = args.journal or default_journal_path(paths)
+    logger.info(f"Rotating {len(paths)} files, journal: {journal_path}")
+    process = partial(rotate_file, old_key=old_key, new_key=args.new_key, kdf=kdf)
+    try:
+        return run_each(paths, printer, process,
+                        map_with_journal(journal_path, partial(map_in_process_pool, max_workers=args.workers)))
+    finally:
+        wipe_derived_keys()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="aiopu", description="Run AIOPU pipelines without the GUI.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress to stderr.")
+    sub = parser.add_subparsers(dest="group", required=True)
+
+    pdf = sub.add_parser("pdf", help="PDF tools.").add_subparsers(dest="command", required=True)
+
+    nup = pdf.add_parser("nup", help="Put several pages on each sheet.")
+    nup.add_argument("paths", nargs="+", help="PDF files, glob patterns or directories.")
+    nup.add_argument("-n", "--pages-per-sheet", type=int,
+                     help="Default: 4, 2 with --booklet, or the cells of --grid.")
+    nup.add_argument("-m", "--margin", type=int, default=5)
+    nup.add_argument("--sheet-size", default="A4", help="A4 (default), A3, A5, Letter, Legal or Tabloid.")
+    nup.add_argument("--portrait", action="store_true", help="Portrait sheets (default: landscape).")
+    nup.add_argument("--grid", help="Columns x rows, e.g. 3x2 (default: as square as the page count allows).")
+    nup.add_argument("--booklet", action="store_true", help="2-up sheets in booklet order for duplex printing.")
+    nup.add_argument("--no-optimize", action="store_true",
+                     help="Do not compress page content or share identical fonts and images.")
+    nup.add_argument("--no-object-streams", action="store_true",
+                     help="Do not pack small objects into compressed object streams (gives PDF 1.3 "
+                          "instead of 1.5, for very old viewers; the file is larger).")
+    nup.add_argument("-o", "--output-dir", help="Directory for the output files (default: next to each input).")
+    nup.add_argument("-w", "--workers", type=int,
+                     help="Worker processes (default: AIOPU_WORKERS or the CPU count).")
+    nup.set_defaults(func=cmd_pdf_nup)
+
+    backends = pdf.add_parser("backends", help="Time the PDF engines on sample files and show the fastest.")
+    backends.add_argument("paths", nargs="*", help="PDF files, glob patterns or directories.")
+    backends.add_argument("--repeat", type=int, default=3, help="Runs per engine and operation (best is kept).")
+    backends.add_argument("--apply", action="store_true",
+                          help="Save the fastest order over all the files; the app and CLI use it from then on.")
+    backends.add_argument("--reset", action="store_true",
+                          help="Delete the saved order and go back to the built-in one.")
+    backends.set_defaults(func=cmd_pdf_backends)
+
+    tables = pdf.add_parser("tables", help="Extract tables to Excel.")
+    tables.add_argument("paths", nargs="+", help="PDF files, glob patterns or directories.")
+    tables.add_argument("-o", "--output", help="Output .xlsx file, or directory with --separate-files.")
+    tables.add_argument("--separate-files", action="store_true", help="Write one workbook per PDF.")
+    tables.add_argument("--separate-tables", action="store_true", help="Write each table to its own sheet.")
+    tables.add_argument("-w", "--workers", type=int,
+                        help="Worker processes (default: AIOPU_WORKERS or the CPU count).")
+    tables.add_argument("--pages-per-chunk", type=int, default=25,
+                        help="Split PDFs into page ranges of this size across workers.")
+    tables.set_defaults(func=cmd_pdf_tables)
+
+    crypt = sub.add_parser("crypt", help="CryptIt encryption.")
+    crypt.add_argument("action", choices=["enc", "dec", "rotate"])
+    crypt.add_argument("paths", nargs="+", help="Files, glob patterns or directories.")
+    crypt.add_argument("-k", "--key", help="Fernet key or passphrase (default: CRYPTO_KEY environment variable).")
+    crypt.add_argument("-f", "--format", choices=["fernet", "chunked", "fernet-raw"], default="fernet",
+                       help="Encryption format for non-JSON files (decryption detects it). fernet is readable by "
+                            "any Fernet tool; chunked (constant memory for large files) and fernet-raw only by this app.")
+    crypt.add_argument("--kdf", choices=["scrypt", "pbkdf2"], default="scrypt",
+                       help="Key derivation when --key is a passphrase (decryption reads it from the file).")
+    crypt.add_argument("--manifest", nargs="?", const="",
+                       help="enc/dec: skip files unchanged since the last run with this manifest "
+                            "(default: .cryptit_manifest_<action>.json in the files' folder).")
+    crypt.add_argument("--new-key", help="rotate: Fernet key or passphrase to re-encrypt with (--key is the old one).")
+    crypt.add_argument("--journal", help="rotate: journal for resuming (default: .cryptit_rotation.jsonl in the files' folder).")
+    crypt.add_argument("-w", "--workers", type=int,
+                       help="rotate: worker processes (default: AIOPU_WORKERS or the CPU count).")
+    crypt.set_defaults(func=cmd_crypt)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Keep stdout for results; console logging goes to stderr and is quiet unless --verbose
+    logging_config = create_logging_config()
+    if not args.verbose:
+        logging_config["handlers"]["console"]["level"] = "WARNING"
+    log_manager = LoggingManager(logging_config, get_current_log_file())
+    log_manager.log_start()
+
+    try:
+        return args.func(args, ResultPrinter(args.json))
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        log_manager.log_end()
+        logging.shutdown()
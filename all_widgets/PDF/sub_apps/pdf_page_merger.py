@@ -1,9 +1,12 @@
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSizePolicy, QLineEdit
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSizePolicy, QLineEdit, QComboBox
 )
 from PySide6.QtCore import Qt
 from modules.event_handler import show_error_message, show_success_message
-from modules.utilities import create_dynamic_pages_per_sheet
+from modules.utilities import create_pages_per_sheet_file, map_in_process_pool
+from modules.pdf_layout import SHEET_SIZES, SheetLayout, parse_grid
+from modules.job_runner import get_job_manager, format_job_summary
+from functools import partial
 from pathlib import Path
 from config.logging_config import get_logger
 from all_widgets.drag_and_drop import DragAndDropArea
@@ -17,13 +20,17 @@ class PDFPageMerger(QWidget):
         super().__init__()
 
         # Drag-and-Drop Area
-        self.dnd = DragAndDropArea()
+        self.dnd = DragAndDropArea(extensions=(".pdf",))
         self.dnd.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
         # Input Fields
         self.inputs = {
             "PAGES PER SHEET": {"type": QLineEdit, "default": 4},
             "MARGIN": {"type": QLineEdit, "default": 5},
+            "GRID": {"type": QLineEdit, "default": "Automatic (or columns x rows, e.g. 3x2)"},
+            "SHEET SIZE": {"type": QComboBox, "options": list(SHEET_SIZES)},
+            "ORIENTATION": {"type": QComboBox, "options": ["Landscape", "Portrait"]},
+            "ORDER": {"type": QComboBox, "options": ["Grid", "Booklet (2 per sheet)"]},
         }
         self.input_manager = InputManagerArea(self.inputs)
 
@@ -48,12 +55,12 @@ class PDFPageMerger(QWidget):
 
         # Signal for dropped files
         self.dnd.filesDropped.connect(self.files_dropped_path)
-        self.path_list = []
+        self.dropped = None
 
-    def files_dropped_path(self, path_list):
-        """Callback for dropped files."""
-        self.path_list = path_list
-        logger.info(f"Files dropped: {path_list}")
+    def files_dropped_path(self, feed):
+        """Callback for dropped files and folders."""
+        self.dropped = feed
+        logger.info(f"Files dropped: {feed.roots}")
 
     def process_all_files(self):
         """Process files based on the inputs."""
@@ -62,31 +69,50 @@ class PDFPageMerger(QWidget):
             form_data = self.input_manager.get_form_data()
             pages_per_sheet = int(form_data.get("PAGES PER SHEET", 4))
             margin = int(form_data.get("MARGIN", 5))
-
-            if pages_per_sheet % 2 != 0:
-                logger.error("Invalid pages per sheet: Only even numbers are allowed.")
-                raise ValueError("Accept only even numbers!")
-
-            if not self.path_list:
+            grid = form_data.get("GRID", "")
+            booklet = form_data.get("ORDER", "Grid").startswith("Booklet")
+            layout_options = dict(
+                sheet_size=form_data.get("SHEET SIZE", "A4"),
+                orientation=form_data.get("ORIENTATION", "Landscape").lower(),
+                grid=parse_grid(grid) if grid[:1].isdigit() else None,
+                order="booklet" if booklet else "grid",
+            )
+            if booklet:
+                pages_per_sheet = 2
+            elif layout_options["grid"] and not self.input_manager.widget_map["PAGES PER SHEET"].text():
+                # Fill the grid unless a number of pages was entered
+                columns, rows = layout_options["grid"]
+                pages_per_sheet = columns * rows
+            SheetLayout(pages_per_sheet, margin=margin, **layout_options)  # Raises ValueError for a bad layout or a count the grid cannot hold
+
+            if self.dropped is None or (self.dropped.finished and not self.dropped.count):
                 logger.error("No files dropped for processing.")
                 raise ValueError("No files to process. Please drop files into the drop area.")
 
-            logger.info(f"Processing files with {pages_per_sheet} pages per sheet and {margin} margin.")
-            for file_path in self.path_list:
-                dir = Path(file_path).parent
-                filename = Path(file_path).stem
+            # Files found in dropped folders are already filtered to PDFs
+            for file_path in (root for root in self.dropped.roots if not Path(root).is_dir()):
                 file_type = Path(file_path).suffix.lower()
 
                 if file_type != ".pdf":
                     logger.error(f"Unsupported file type: {file_path}. Expected a .pdf file.")
                     raise TypeError(f"Unsupported file type: {file_path}. Expected a .pdf file.")
 
-                save_path = dir / f"{filename}_{pages_per_sheet}pages_per_sheet.pdf"
-                logger.info(f"Creating {pages_per_sheet}-page-per-sheet PDF for {file_path}. Output: {save_path}")
-                create_dynamic_pages_per_sheet(file_path, str(save_path), pages_per_sheet, margin)
-
-            logger.info("All files processed successfully. Output files created.")
-            show_success_message(None, "SUCCESS", "Please check your output")
+            logger.info(f"Processing files with {pages_per_sheet} pages per sheet and {margin} margin.")
+            process = partial(create_pages_per_sheet_file, pages_per_sheet=pages_per_sheet, margin=margin,
+                              **layout_options)
+            if len(self.dropped.roots) == 1 and not Path(self.dropped.roots[0]).is_dir():
+                # A single PDF: spread its page ranges over all cores instead
+                process, map_func = partial(process, max_workers=None), None
+            else:
+                map_func = map_in_process_pool  # Spread files over all cores
+            # Run in the background so the window stays responsive
+            get_job_manager().submit(
+                f"Page Pack ({self.dropped.describe()})",
+                self.dropped,
+                process,
+                on_finished=self.on_job_finished,
+                map_func=map_func,
+            )
 
         except ValueError as ve:
             logger.error(f"Value error: {ve}")
@@ -97,3 +123,11 @@ class PDFPageMerger(QWidget):
         except Exception as e:
             logger.error(f"Unexpected error during processing: {e}")
             show_error_message(None, "ERROR", str(e))
+
+    def on_job_finished(self, job_id, summary):
+        """Report the result of a background Page Pack job."""
+        if summary["failed"]:
+            show_error_message(None, "ERROR", format_job_summary(summary))
+        else:
+            logger.info("All files processed successfully. Output files created.")
+            show_success_message(None, "SUCCESS", "Please check your output")
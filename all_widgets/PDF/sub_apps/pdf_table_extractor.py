@@ -3,7 +3,13 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 from all_widgets.drag_and_drop import DragAndDropArea
-from modules.utilities import extract_tables_from_pdfs
+from modules.utilities import (
+    extract_tables_in_page_ranges, extract_tables_from_pdf_to_excel, save_combined_tables, get_tables_output_path,
+    get_pdf_name, get_worker_count, map_in_process_pool
+)
+from modules.job_runner import get_job_manager, format_job_summary
+from functools import partial
+from pathlib import Path
 from config.logging_config import get_logger
 from modules.event_handler import show_success_message, show_error_message
 from all_widgets.mode_manager_area import ModeManagerArea
@@ -15,7 +21,7 @@ class PDFTableExtractor(QWidget):
         super().__init__()
 
         # Drag-and-Drop Area
-        self.dnd = DragAndDropArea()
+        self.dnd = DragAndDropArea(extensions=(".pdf",))
         self.dnd.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
         # Modes and Widgets
@@ -51,16 +57,16 @@ class PDFTableExtractor(QWidget):
 
         # Signal for dropped files
         self.dnd.filesDropped.connect(self.files_dropped_path)
-        self.path_list = []
+        self.dropped = None
 
     def on_mode_changed(self, mode):
         """Callback for mode changes."""
         logger.info(f"Mode changed to: {mode}")
 
-    def files_dropped_path(self, path_list):
-        """Callback for file drops."""
-        self.path_list = path_list
-        logger.info(f"Files dropped: {path_list}")
+    def files_dropped_path(self, feed):
+        """Callback for dropped files and folders."""
+        self.dropped = feed
+        logger.info(f"Files dropped: {feed.roots}")
 
     def process_all_files(self):
         """Process files based on the selected mode."""
@@ -69,21 +75,58 @@ class PDFTableExtractor(QWidget):
             mode = form_data["mode"]
             logger.info(f"Processing mode: {mode}")
 
-            if not self.path_list:
+            if self.dropped is None or (self.dropped.finished and not self.dropped.count):
                 raise ValueError("No files dropped into the area.")
 
             if mode == "Normal":
                 combine_files = form_data["Combine Files"] == "Yes"
                 combine_tables = form_data["Combine Tables"] == "Yes"
-                extract_tables_from_pdfs(self.path_list, None, combine_files, combine_tables)
+                output_path = get_tables_output_path(self.dropped.roots, combine_files)
+
+                # Fewer dropped PDFs than cores: split each one into page ranges across all cores instead
+                split_pages = (not any(Path(root).is_dir() for root in self.dropped.roots)
+                               and len(self.dropped.roots) < get_worker_count())
+                max_workers = None if split_pages else 1
+
+                # Combined output collects every file's tables and writes them once all files are done
+                if combine_files:
+                    func = partial(extract_tables_in_page_ranges, combine_tables=combine_tables, max_workers=max_workers)
+                    finalize = partial(self.save_combined, output_path=output_path)
+                else:
+                    func = partial(extract_tables_from_pdf_to_excel, output_dir=output_path,
+                                   combine_tables=combine_tables, max_workers=max_workers)
+                    finalize = None
+
+                # Run in the background, spreading files (or the page ranges of each file) over all cores
+                get_job_manager().submit(
+                    f"Table Extractor ({self.dropped.describe()})",
+                    self.dropped,
+                    func,
+                    finalize=finalize,
+                    on_finished=self.on_job_finished,
+                    map_func=None if split_pages else map_in_process_pool,
+                )
 
             elif mode == "Specific Case":
                 specific_option = form_data["Specific Case Option"]
                 logger.info(f"Processing Specific Case with option: {specific_option}")
                 # Specific case logic
 
-            show_success_message(None, "SUCCEEDED", "PDF table extraction completed successfully.")
         except Exception as e:
             logger.error(f"Error processing files: {e}")
             show_error_message(None, "ERROR", f"{e}")
             return
+
+    @staticmethod
+    def save_combined(results, output_path):
+        """Write the tables of all PDFs of a job into one Excel file. Runs on a worker thread."""
+        save_combined_tables({get_pdf_name(pdf_path): file_results for pdf_path, file_results in results},
+                             output_path)
+        return output_path
+
+    def on_job_finished(self, job_id, summary):
+        """Report the result of a background table extraction job."""
+        if summary["failed"]:
+            show_error_message(None, "ERROR", format_job_summary(summary))
+        else:
+            show_success_message(None, "SUCCEEDED", "PDF table extraction completed successfully.")
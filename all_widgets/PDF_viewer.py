@@ -1,23 +1,33 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from PySide6.QtCore import  QUrl
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineSettings
+from all_widgets.web_engine import create_web_view, load_web_engine
 
 class PDFViewer(QWidget):
     def __init__(self, filepath):
         super().__init__()
         self.setWindowTitle("PDF Viewer")
+        self.filepath = filepath
 
-        self.web_view = QWebEngineView()
+        # The web view is created on first show so QtWebEngine is only loaded when needed
+        self.web_view = None
+
+        self.main_layout = QVBoxLayout(self)
+        self.setLayout(self.main_layout)
+
+    def showEvent(self, event):
+        if self.web_view is None:
+            self.init_web_view()
+        super().showEvent(event)
+
+    def init_web_view(self):
+        QWebEngineSettings = load_web_engine().QWebEngineSettings
+        self.web_view = create_web_view()
         # Set PDF Viewer to True, if not you can't load and view a pdf.
         self.web_view.settings().setAttribute(QWebEngineSettings.PluginsEnabled, True)
         self.web_view.settings().setAttribute(QWebEngineSettings.PdfViewerEnabled, True)
-        self.web_view.load(QUrl.fromLocalFile(filepath))
+        self.web_view.load(QUrl.fromLocalFile(self.filepath))
         self.web_view.loadFinished.connect(self.on_load_finished)
-
-        layout = QVBoxLayout(self)
-        layout.addWidget(self.web_view)
-        self.setLayout(layout)
+        self.main_layout.addWidget(self.web_view)
 
     def on_load_finished(self, success):
         if not success:
@@ -1,5 +1,18 @@
-from .cryptit import CryptIt
-from .google import Google
-from .gemini import Gemini
+from importlib import import_module
+
+# Apps are imported on first attribute access so that importing a light module
+# such as `all_widgets.registry` does not pull in every app (and QtWebEngine).
+_lazy_exports = {
+    "CryptIt": ".cryptit",
+    "Google": ".google",
+    "Gemini": ".gemini",
+}
 
 __all__ = ["CryptIt", "Google", "Gemini"]  # Define the public API
+
+
+def __getattr__(name):
+    if name in _lazy_exports:
+        module = import_module(_lazy_exports[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
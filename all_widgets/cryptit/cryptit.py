@@ -3,12 +3,16 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 from modules.event_handler import show_error_message, show_success_message
-from modules.os import read_file, write_file, get_file_type
-from modules.security import *
+from modules.crypt_files import (
+    crypt_file, resolve_key, rotate_file, map_with_journal, default_journal_path, get_manifest_name,
+    get_manifest_settings, CHUNKED, FERNET, FERNET_RAW
+)
+from modules.manifest import map_with_manifest, default_manifest_path
+from modules.job_runner import get_job_manager, format_job_summary
+from functools import partial
 from all_widgets.drag_and_drop import DragAndDropArea
 from all_widgets.input_manager_area import InputManagerArea
 from config.logging_config import get_logger
-import os
 
 logger = get_logger(__name__)
 
@@ -25,8 +29,11 @@ class CryptIt(QWidget):
 
         # Input Fields
         self.inputs = {
-            "TYPE": {"type": QComboBox, "options": ["Encrypt", "Decrypt"]},
-            "KEY": {"type": QLineEdit, "default": "Enter an encryption key or leave it blank to use the default key (configured by you)"},
+            "TYPE": {"type": QComboBox, "options": ["Encrypt", "Decrypt", "Rotate"]},
+            "KEY": {"type": QLineEdit, "default": "Enter an encryption key or passphrase, or leave it blank to use the default key (configured by you)"},
+            "FORMAT": {"type": QComboBox, "options": [FERNET, CHUNKED, FERNET_RAW]},
+            "INCREMENTAL": {"type": QComboBox, "options": ["No", "Yes"]},
+            "NEW KEY": {"type": QLineEdit, "default": "Rotate only: the new key or passphrase (KEY is the current one)"},
         }
         self.input_manager = InputManagerArea(self.inputs)
 
@@ -49,70 +56,76 @@ class CryptIt(QWidget):
 
         self.setLayout(main_layout)
 
-        # Signal for dropped files
+        # Signal for dropped files; folders keep being scanned in the background
         self.dnd.filesDropped.connect(self.files_dropped_path)
-        self.path_list = []
+        self.dropped = None
+
+    def files_dropped_path(self, feed):
+        """Callback for dropped files and folders."""
+        self.dropped = feed
+        logger.info(f"Files dropped: {feed.roots}")
 
-    def files_dropped_path(self, path_list):
-        """Callback for dropped files."""
-        self.path_list = path_list
-        logger.info(f"Files dropped: {path_list}")
+    def typed_text(self, form_data, label):
+        """Text entered in a QLineEdit input; get_form_data falls back to the placeholder, which must never become a key."""
+        value = form_data.get(label)
+        return None if value == self.inputs[label].get("default") else value
 
     def process_all_files(self):
         """Process files based on the inputs."""
         try:
             # Retrieve input values
             form_data = self.input_manager.get_form_data()
-            key = form_data.get("KEY")
+            key = resolve_key(self.typed_text(form_data, "KEY"))
             cur_val_dropdown = form_data.get("TYPE")
 
-            if not key and not os.environ.get('CRYPTO_KEY'):
-                raise ValueError("No encryption key provided. Please set CRYPTO_KEY or enter a key manually.")
-
-            key = os.environ.get('CRYPTO_KEY') if not key else key
-
-            if not self.path_list:
+            if self.dropped is None:
                 raise ValueError("No files dropped for processing. Please drop files into the drop area.")
-
-            for file_path in self.path_list:
-                # Read data from file
-                logger.info(f"Reading file: {file_path}")
-                data = read_file(file_path)
-                if not data:
-                    logger.warning(f"No data found in file: {file_path}")
-                    continue
-
-                dir = os.path.dirname(file_path)
-                filename = os.path.basename(file_path)
-                file_type = get_file_type(file_path)
-
-                # Encryption, Decryption
-                if cur_val_dropdown == "Encrypt":
-                    match file_type:
-                        case 'application/json':
-                            encrypt_kv_value_only(data, key)
-                            output_msg = data
-                        case _:
-                            output_msg = encrypt_message(data, key)
-                    new_filename = "encrypted_" + filename
-                else:
-                    match file_type:
-                        case 'application/json':
-                            decrypt_kv_value_only(data, key)
-                            output_msg = data
-                        case _:
-                            output_msg = decrypt_message(data, key)
-                    new_filename = "decrypted_" + filename.replace('encrypted_', '')
-
-                # Write new file
-                save_path = os.path.join(dir, new_filename)
-                write_file(save_path, output_msg)
-                logger.info(f"Processed file '{file_path}'. Saved as '{save_path}'.")
-
-            show_success_message(None, "SUCCESS", 'Done!')
-            logger.info("All files processed successfully.")
+            if self.dropped.finished and not self.dropped.count:
+                raise ValueError("No files found in the dropped folders.")
+
+            if cur_val_dropdown == "Rotate":
+                self.rotate_all_files(key, self.typed_text(form_data, "NEW KEY"))
+                return
+
+            # Incremental runs skip files that have not changed since the last run
+            map_func = None
+            if form_data.get("INCREMENTAL") == "Yes":
+                map_func = map_with_manifest(default_manifest_path(self.dropped.roots, get_manifest_name(cur_val_dropdown)),
+                                             settings=get_manifest_settings(key, cur_val_dropdown, form_data.get("FORMAT")))
+
+            # Run in the background so the window stays responsive; files are processed as they are found
+            get_job_manager().submit(
+                f"CryptIt {cur_val_dropdown} ({self.dropped.describe()})",
+                self.dropped,
+                partial(crypt_file, key=key, action=cur_val_dropdown, fmt=form_data.get("FORMAT")),
+                on_finished=self.on_job_finished,
+                map_func=map_func,
+            )
 
         except Exception as e:
             show_error_message(None, "ERROR", f"{e}")
             logger.error(f"Unexpected error during file processing: {e}")
-            raise
+
+    def rotate_all_files(self, key, new_key):
+        """Re-key the dropped files in place on worker processes, resumable through a journal."""
+        from modules.utilities import map_in_process_pool  # Pulls in the PDF libraries, so only when needed
+
+        if not new_key:
+            raise ValueError("Enter the new key or passphrase in NEW KEY to rotate.")
+        journal_path = default_journal_path(self.dropped.roots)
+        logger.info(f"Rotating dropped files ({self.dropped.describe()}), journal: {journal_path}")
+        get_job_manager().submit(
+            f"CryptIt Rotate ({self.dropped.describe()})",
+            self.dropped,
+            partial(rotate_file, old_key=key, new_key=new_key),
+            on_finished=self.on_job_finished,
+            map_func=map_with_journal(journal_path, map_in_process_pool),
+        )
+
+    def on_job_finished(self, job_id, summary):
+        """Report the result of a background CryptIt job."""
+        if summary["failed"]:
+            show_error_message(None, "ERROR", format_job_summary(summary))
+        else:
+            show_success_message(None, "SUCCESS", 'Done!')
+            logger.info("All files processed successfully.")
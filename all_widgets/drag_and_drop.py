@@ -1,17 +1,145 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel)
-from PySide6.QtCore import Qt, Signal
+import os
+import threading
+import time
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QTableView, QHeaderView, QAbstractItemView)
+from PySide6.QtCore import Qt, Signal, QObject, QRunnable, QThreadPool
+from modules.os import iter_files
+from modules.job_runner import get_job_manager
+from all_widgets.file_list_model import DroppedFilesModel
 from config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+SCAN_BATCH_SIZE = 1000     # Report found files at least every this many files...
+SCAN_BATCH_SECONDS = 0.1   # ...or this often, whichever comes first
+
+
+class ScanFeed:
+    """
+    Thread-safe, growing list of the files found for one drop, without duplicates.
+    Iterating it yields every file and, while the scan is still running, waits for more,
+    so a job given the feed starts on the first files before the folder walk has finished.
+    """
+
+    def __init__(self, roots):
+        self.roots = list(roots)  # The dropped paths
+        self.paths = []
+        self._seen = set()
+        self.finished = False
+        self.cancelled = False
+        self._condition = threading.Condition()
+
+    @property
+    def count(self):
+        return len(self.paths)
+
+    def describe(self):
+        """Short description for job names, e.g. '12 files' or 'scanning'."""
+        return f"{self.count} files" if self.finished else "scanning"
+
+    def add(self, paths):
+        with self._condition:
+            for path in paths:
+                if path not in self._seen:
+                    self._seen.add(path)
+                    self.paths.append(path)
+            self._condition.notify_all()
+
+    def paths_from(self, start):
+        """Paths found after the first start ones."""
+        with self._condition:
+            return self.paths[start:]
+
+    def finish(self):
+        with self._condition:
+            self.finished = True
+            self._condition.notify_all()
+
+    def cancel(self):
+        self.cancelled = True
+        self.finish()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self.paths) and not self.finished:
+                    self._condition.wait()
+                batch = self.paths[index:]
+                if not batch:
+                    return
+            index += len(batch)
+            yield from batch
+
+
+_active_feeds = set()  # Feeds of running scans
+
+
+class FolderScanSignals(QObject):
+    found = Signal(int)      # Files found so far
+    finished = Signal(int)   # Total files found
+
+
+class FolderScan(QRunnable):
+    """Walk the dropped paths on a pool thread, feeding files into a ScanFeed in batches."""
+
+    def __init__(self, feed, extensions=None):
+        super().__init__()
+        self.setAutoDelete(False)  # The drop area keeps the scan until its signals are delivered
+        self.feed = feed
+        self.extensions = extensions
+        self.signals = FolderScanSignals()
+
+    def run(self):
+        batch = []
+        last_report = time.perf_counter()
+        try:
+            for path in iter_files(self.feed.roots, self.extensions):
+                if self.feed.cancelled:
+                    break
+                batch.append(path)
+                if len(batch) >= SCAN_BATCH_SIZE or time.perf_counter() - last_report >= SCAN_BATCH_SECONDS:
+                    self.feed.add(batch)
+                    self.signals.found.emit(self.feed.count)
+                    batch = []
+                    last_report = time.perf_counter()
+            self.feed.add(batch)
+        except Exception as e:
+            logger.error(f"Scanning dropped files failed: {e}", exc_info=True)
+        finally:
+            self.feed.finish()
+            _active_feeds.discard(self.feed)
+            logger.info(f"Scan of dropped paths finished: {self.feed.count} files.")
+            self.signals.finished.emit(self.feed.count)
+
+
+def cancel_scans():
+    """Stop all running folder scans (used on shutdown)."""
+    for feed in list(_active_feeds):
+        feed.cancel()
+
+
 class DragAndDropArea(QWidget):
+    """
+    Drop area for files and folders. Folders are expanded recursively on a background thread.
 
-    filesDropped = Signal(list)
+    filesDropped(feed) is emitted right away with a ScanFeed that fills up as files are found,
+    and scanFinished(feed) once the scan is done. The files are listed in a table that also
+    shows their status in jobs that process the feed.
+    extensions, e.g. ('.pdf',), filters the files found inside dropped folders.
+    """
 
-    def __init__(self):
+    filesDropped = Signal(object)
+    scanFinished = Signal(object)
+
+    def __init__(self, extensions=None):
         super().__init__()
+        self.extensions = extensions
+        self.feed = None
+        self.scan = None
         self.setAcceptDrops(True)
         self.initUI()
+        get_job_manager().job_added.connect(self.on_job_added)
 
     def initUI(self):
 
@@ -25,8 +153,21 @@ class DragAndDropArea(QWidget):
                 }
             """)
 
+        # Only the visible rows are ever asked for, so this stays fast for any number of files
+        self.model = DroppedFilesModel(self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setWordWrap(False)
+        self.view.verticalHeader().setVisible(False)
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.view.horizontalHeader().setSectionResizeMode(DroppedFilesModel.COLUMN_FILE, QHeaderView.Stretch)
+        self.view.hide()
+
         layout = QVBoxLayout(self)
         layout.addWidget(self.label)
+        layout.addWidget(self.view, 1)
         self.setLayout(layout)
 
     def dragEnterEvent(self, event):
@@ -41,13 +182,6 @@ class DragAndDropArea(QWidget):
         if event.mimeData().hasUrls():
             event.setDropAction(Qt.CopyAction)
             event.accept()
-            show_filepaths = ''
-            all_filepaths = []
-            for url in event.mimeData().urls():
-                filepath = url.toLocalFile()
-                all_filepaths.append(filepath)
-                show_filepaths += f"{filepath}\n"
-                self.label.setText(f"Dropped file\n {show_filepaths}")
             self.label.setStyleSheet("""
                             QLabel {
                                 border: 2px dashed #FFFFFF; /* White dashed border */
@@ -55,11 +189,62 @@ class DragAndDropArea(QWidget):
                                 padding: 10px; /* Add some padding */
                             }
                         """)
-            self.filesDropped.emit(all_filepaths)
+            self.start_scan([url.toLocalFile() for url in event.mimeData().urls()])
             logger.info("Drop operation succeeded: File(s) dropped into the upload area.")
         else:
             event.ignore()
 
+    def start_scan(self, paths):
+        """Expand the dropped paths in the background, replacing any scan still running."""
+        if self.feed is not None:
+            self.feed.cancel()
+        feed = ScanFeed(paths)
+        scan = FolderScan(feed, self.extensions)
+        scan.signals.found.connect(self.on_scan_progress)
+        scan.signals.finished.connect(self.on_scan_finished)
+        self.feed = feed
+        self.scan = scan
+        _active_feeds.add(feed)
+        self.model.clear()
+        self.view.show()
+        self.label.setText("Scanning dropped files...")
+        self.filesDropped.emit(feed)
+        QThreadPool.globalInstance().start(scan)
+
+    def sync_model(self):
+        # Append what the scan found since the last update, as one batch
+        self.model.add_paths(self.feed.paths_from(self.model.rowCount()))
+
+    def on_scan_progress(self, count):
+        if self.sender() is self.scan.signals:
+            self.sync_model()
+            self.label.setText(f"Scanning dropped files... {count} found")
+
+    def on_scan_finished(self, count):
+        if self.sender() is not self.scan.signals:
+            return  # Replaced by a newer drop
+        self.sync_model()
+        self.label.setText(f"Dropped {count} file(s)")
+        self.scanFinished.emit(self.feed)
+
+    def on_job_added(self, job):
+        """Show the per-file status of jobs that process the current drop."""
+        if self.feed is None or job.items is not self.feed:
+            return
+        self.model.set_default_status("Queued")
+        job.signals.item_finished.connect(self.on_item_finished)
+        job.signals.item_failed.connect(self.on_item_failed)
+
+    def on_item_finished(self, job_id, item, result):
+        # Results are output paths, or a short status such as "Unchanged (manifest)"
+        if isinstance(result, str) and not os.path.isabs(result):
+            self.model.set_status(item, result)
+        else:
+            self.model.set_status(item, "Done", result if isinstance(result, str) else "")
+
+    def on_item_failed(self, job_id, item, error):
+        self.model.set_status(item, "Failed", error)
+
     def dragLeaveEvent(self, event):
         logger.info("Drop operation canceled: User dragged item outside the valid area.")
         # Reset the background color when the drag leaves the area
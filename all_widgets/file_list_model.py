@@ -0,0 +1,157 @@
+import os
+from functools import partial
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from modules.async_bridge import get_async_bridge
+from modules.os import amap_files, run_io
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def format_size(size):
+    """Human-readable file size, e.g. '1.2 MB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+async def read_sizes(paths):
+    """Sizes in bytes of files (None for files that cannot be read), each stat run on the I/O pool."""
+    async def size(path):
+        return await run_io(os.path.getsize, path)
+
+    return [result async for _, result, _ in amap_files(size, paths)]
+
+
+class DroppedFilesModel(QAbstractTableModel):
+    """
+    Table of dropped files for a QTableView: file, size and processing status.
+    Rows are appended in batches; sizes are only looked up for rows the view actually shows,
+    in the background through the async bridge so a slow drive never stalls painting, and
+    status changes are repainted together a few times per second.
+    """
+
+    COLUMN_FILE, COLUMN_SIZE, COLUMN_STATUS = range(3)
+    HEADERS = ["File", "Size", "Status"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paths = []
+        self.rows = {}      # path -> row, for de-duplication and status updates
+        self.sizes = {}     # row -> size in bytes (None if the file cannot be read)
+        self.size_requests = set()  # Rows whose size is being read
+        self.size_queue = []        # Rows whose size is to be read with the next batch
+        self.generation = 0         # Bumped by clear(), so sizes read for earlier rows are dropped
+        self.statuses = {}  # row -> (status, tooltip)
+        self.default_status = ""  # Status of rows without one, e.g. "Queued" once a job has them
+        self.changed_rows = None  # (first, last) row with a status change not yet announced
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(100)
+        self.flush_timer.timeout.connect(self.flush_status_changes)
+        self.size_timer = QTimer(self)  # Collects the rows of one repaint into a single request
+        self.size_timer.setSingleShot(True)
+        self.size_timer.setInterval(0)
+        self.size_timer.timeout.connect(self.request_sizes)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            if column == self.COLUMN_FILE:
+                return self.paths[row]
+            if column == self.COLUMN_SIZE:
+                size = self.size(row)
+                return format_size(size) if size is not None else ""
+            return self.statuses.get(row, (self.default_status, ""))[0]
+        if role == Qt.ToolTipRole and column == self.COLUMN_STATUS:
+            return self.statuses.get(row, ("", ""))[1] or None
+        if role == Qt.TextAlignmentRole and column == self.COLUMN_SIZE:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def size(self, row):
+        """Size of a row's file, or None while it is being read (or if it cannot be)."""
+        if row in self.sizes:
+            return self.sizes[row]
+        if row not in self.size_requests:
+            self.size_requests.add(row)
+            self.size_queue.append(row)
+            if not self.size_timer.isActive():
+                self.size_timer.start()
+        return None
+
+    def request_sizes(self):
+        rows, self.size_queue = self.size_queue, []
+        if rows:
+            done = partial(self.sizes_read, self.generation, rows)
+            get_async_bridge().run(read_sizes([self.paths[row] for row in rows]), done,
+                                   lambda error: done([None] * len(rows)))
+
+    def sizes_read(self, generation, rows, sizes):
+        """Store sizes read in the background (called on the GUI thread) and repaint their cells."""
+        if generation != self.generation:
+            return  # The rows were cleared meanwhile
+        for row, size in zip(rows, sizes):
+            self.sizes[row] = size
+            self.size_requests.discard(row)
+        self.dataChanged.emit(self.index(min(rows), self.COLUMN_SIZE), self.index(max(rows), self.COLUMN_SIZE),
+                              [Qt.DisplayRole])
+
+    def add_paths(self, paths):
+        """Append new paths as one insertion; paths already listed are skipped."""
+        new_paths = []
+        for path in paths:
+            if path not in self.rows:
+                self.rows[path] = len(self.paths) + len(new_paths)
+                new_paths.append(path)
+        if not new_paths:
+            return
+        first = len(self.paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_paths) - 1)
+        self.paths.extend(new_paths)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths, self.rows, self.sizes, self.statuses = [], {}, {}, {}
+        self.size_requests, self.size_queue = set(), []
+        self.generation += 1
+        self.default_status = ""
+        self.changed_rows = None
+        self.endResetModel()
+
+    def set_default_status(self, status):
+        self.default_status = status
+        if self.paths:
+            self.dataChanged.emit(self.index(0, self.COLUMN_STATUS), self.index(len(self.paths) - 1, self.COLUMN_STATUS))
+
+    def set_status(self, path, status, tooltip=""):
+        row = self.rows.get(path)
+        if row is None:
+            return
+        self.statuses[row] = (status, tooltip)
+        first, last = self.changed_rows if self.changed_rows else (row, row)
+        self.changed_rows = (min(first, row), max(last, row))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_status_changes(self):
+        if self.changed_rows:
+            first, last = self.changed_rows
+            self.changed_rows = None
+            self.dataChanged.emit(self.index(first, self.COLUMN_STATUS), self.index(last, self.COLUMN_STATUS),
+                                  [Qt.DisplayRole, Qt.ToolTipRole])
@@ -1,7 +1,6 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QHBoxLayout
 from PySide6.QtCore import QUrl
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEnginePage
+from all_widgets.web_engine import create_web_view, create_history_page
 from config.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -13,9 +12,8 @@ class Google(QWidget):
         super().__init__()
         self.setWindowTitle("Google")
 
-        self.web_view = QWebEngineView()
-        self.web_view.setPage(WebEnginePageWithHistory(self))
-        self.web_view.load(QUrl('https://www.google.com/'))
+        # The web view is created on first show so QtWebEngine is only loaded when needed
+        self.web_view = None
 
         # Back and forward buttons
         back_button = QPushButton("Back")
@@ -30,14 +28,27 @@ class Google(QWidget):
         button_layout.addWidget(forward_button)
 
         # Main layout
-        layout = QVBoxLayout(self)
-        layout.addLayout(button_layout)
-        layout.addWidget(self.web_view)
-        self.setLayout(layout)
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.addLayout(button_layout)
+        self.setLayout(self.main_layout)
+
+    def showEvent(self, event):
+        """Create the web view the first time the app is shown."""
+        if self.web_view is None:
+            self.init_web_view()
+        super().showEvent(event)
+
+    def init_web_view(self):
+        """Create the web view and start loading the page."""
+        self.web_view = create_web_view()
+        self.web_view.setPage(create_history_page(self))
+        self.web_view.load(QUrl('https://www.google.com/'))
+        self.main_layout.addWidget(self.web_view)
+        logger.info("Web view created for Google.")
 
     def navigate_back(self):
         """Handle back navigation and log the event."""
-        if self.web_view.history().canGoBack():
+        if self.web_view is not None and self.web_view.history().canGoBack():
             self.web_view.back()
             logger.info("Navigated back in web view history.")
         else:
@@ -45,16 +56,8 @@ class Google(QWidget):
 
     def navigate_forward(self):
         """Handle forward navigation and log the event."""
-        if self.web_view.history().canGoForward():
+        if self.web_view is not None and self.web_view.history().canGoForward():
             self.web_view.forward()
             logger.info("Navigated forward in web view history.")
         else:
-            logger.warning("Forward navigation requested but no next page available.")
-
-class WebEnginePageWithHistory(QWebEnginePage):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-
-    def canGoBack(self):
-        """Override canGoBack to enable back navigation."""
-        return True
\ No newline at end of file
+            logger.warning("Forward navigation requested but no next page available.")
\ No newline at end of file
@@ -0,0 +1,94 @@
+import time
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem, QProgressBar, QPushButton, QHeaderView
+)
+from modules.job_runner import get_job_manager
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobListWidget(QWidget):
+    """List of background jobs with progress, status and cancellation."""
+
+    COLUMN_NAME, COLUMN_PROGRESS, COLUMN_STATUS, COLUMN_CANCEL = range(4)
+
+    def __init__(self, job_manager=None):
+        super().__init__()
+        self.job_manager = job_manager if job_manager else get_job_manager()
+        self.rows = {}  # job id -> (tree item, progress bar, cancel button)
+        self.started_at = {}  # job id -> perf_counter() when it started, for the rate
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Job", "Progress", "Status", ""])
+        self.tree.setRootIsDecorated(False)
+        self.tree.header().setSectionResizeMode(self.COLUMN_NAME, QHeaderView.Stretch)
+
+        self.clear_button = QPushButton("Clear finished")
+        self.clear_button.clicked.connect(self.clear_finished)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        button_layout.addWidget(self.clear_button)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.tree)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+        for job in self.job_manager.jobs.values():
+            self.add_job(job)
+        self.job_manager.job_added.connect(self.add_job)
+
+    def add_job(self, job):
+        """Add a row for a job and follow its signals."""
+        item = QTreeWidgetItem([job.name, "", job.status, ""])
+        self.tree.addTopLevelItem(item)
+
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 0)  # Busy indicator until the first progress update
+        self.tree.setItemWidget(item, self.COLUMN_PROGRESS, progress_bar)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(job.cancel)
+        self.tree.setItemWidget(item, self.COLUMN_CANCEL, cancel_button)
+
+        self.rows[job.job_id] = (item, progress_bar, cancel_button)
+        job.signals.started.connect(self.on_started)
+        job.signals.progress.connect(self.on_progress)
+        job.signals.finished.connect(self.on_finished)
+
+    def on_started(self, job_id):
+        self.started_at[job_id] = time.perf_counter()
+        item, _, _ = self.rows[job_id]
+        item.setText(self.COLUMN_STATUS, "Running")
+
+    def on_progress(self, job_id, done, total, current_item):
+        item, progress_bar, _ = self.rows[job_id]
+        elapsed = time.perf_counter() - self.started_at.get(job_id, time.perf_counter())
+        rate = f" ({done / elapsed:.1f}/s)" if elapsed > 0 else ""
+        if total:
+            progress_bar.setRange(0, total)
+            progress_bar.setValue(done)
+            item.setText(self.COLUMN_STATUS, f"{done}/{total}{rate}")
+        else:
+            item.setText(self.COLUMN_STATUS, f"{done} done{rate}")
+        item.setToolTip(self.COLUMN_NAME, current_item)
+
+    def on_finished(self, job_id, summary):
+        item, progress_bar, cancel_button = self.rows[job_id]
+        progress_bar.setRange(0, 1)
+        progress_bar.setValue(1)
+        cancel_button.setEnabled(False)
+        item.setText(self.COLUMN_STATUS,
+                     f"{summary['status']} ({summary['succeeded']} ok, {summary['failed']} failed)")
+
+    def clear_finished(self):
+        """Remove rows of jobs that are done."""
+        for job_id in list(self.rows):
+            job = self.job_manager.jobs.get(job_id)
+            if job is None or job.summary is not None:
+                item, _, _ = self.rows.pop(job_id)
+                self.started_at.pop(job_id, None)
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+        self.job_manager.clear_finished()
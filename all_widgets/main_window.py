@@ -1,13 +1,20 @@
-from PySide6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QStackedWidget, QLabel
+from PySide6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QStackedWidget, QLabel, QDockWidget
 from PySide6.QtGui import QPixmap, QFontDatabase, QFont, QIcon
 from PySide6.QtCore import Qt
 from all_widgets.sidebar import Sidebar
 from modules.event_handler import InternetChecker
-from all_widgets.registry import AppRegistry
+from all_widgets.registry import AppRegistry, LazyAppPage
+from all_widgets.job_list import JobListWidget
+from all_widgets.drag_and_drop import cancel_scans
+from modules.job_runner import get_job_manager
+from modules.async_bridge import shutdown_async_bridge
+from modules.os import shutdown_io_executor
 from config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+JOB_SHUTDOWN_TIMEOUT_MS = 30000  # How long closing waits for running jobs to finish their current item
+
 
 class MainWindow(QMainWindow):
 
@@ -52,6 +59,14 @@ class MainWindow(QMainWindow):
         )
         self.menubar.setCornerWidget(self.status_icon_label, Qt.TopRightCorner)
 
+        # Background jobs (hidden until a job is submitted or toggled from the menu)
+        self.job_dock = QDockWidget("Jobs", self)
+        self.job_dock.setWidget(JobListWidget())
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.job_dock)
+        self.job_dock.hide()
+        self.menubar.addAction(self.job_dock.toggleViewAction())
+        get_job_manager().job_added.connect(lambda job: self.job_dock.show())
+
         # Sidebar and content area
         self.sidebar = Sidebar()
         self.content_area = QStackedWidget()
@@ -104,6 +119,28 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 logger.error(f"Failed to load app '{app_name}': {e}", exc_info=True)
 
+    def ensure_app_loaded(self, stack, index):
+        """Replace a lazy placeholder at the given stack index with the real app widget."""
+        widget = stack.widget(index)
+        if not isinstance(widget, LazyAppPage):
+            return widget
+
+        try:
+            real_widget = AppRegistry.materialize(widget)
+        except Exception as e:
+            widget.label.setText(f"Failed to load {widget.objectName()}.")
+            logger.error(f"Failed to load app '{widget.objectName()}': {e}", exc_info=True)
+            return widget
+
+        was_current = stack.currentIndex() == index
+        stack.insertWidget(index, real_widget)
+        stack.removeWidget(widget)
+        widget.deleteLater()
+        if was_current:
+            stack.setCurrentIndex(index)
+        logger.info(f"App '{real_widget.objectName()}' constructed on first open.")
+        return real_widget
+
     def switch_app(self, index):
         """Switch between main apps."""
         adjusted_index = index + 1  # Offset for blank page
@@ -122,6 +159,9 @@ class MainWindow(QMainWindow):
 
         # Switch to the selected app
         if adjusted_index < self.content_area.count():
+            selected_app = self.ensure_app_loaded(self.content_area, adjusted_index)
+            if isinstance(selected_app, QStackedWidget) and selected_app.count() > 0:
+                self.ensure_app_loaded(selected_app, selected_app.currentIndex())
             self.last_selected_main_app = adjusted_index
             logger.info(f"Switched to main app: {selected_app.objectName()} (index {index}).")
             self.content_area.setCurrentIndex(adjusted_index)
@@ -161,6 +201,7 @@ class MainWindow(QMainWindow):
         for i in range(current_app.count()):
             widget = current_app.widget(i)
             if widget.objectName() == sub_app_name:
+                self.ensure_app_loaded(current_app, i)
                 current_app.setCurrentIndex(i)
 
                 # Update the last selected sub-app for the current main app
@@ -214,7 +255,18 @@ class MainWindow(QMainWindow):
             logger.warning("No internet connection detected. Status icon updated to red.")
 
     def closeEvent(self, event):
-        """Stop the InternetChecker when closing the app."""
+        """Stop the InternetChecker and background jobs when closing the app."""
+        from modules.security import wipe_derived_keys  # Imported here to keep cryptography out of startup
+
         self.internet_checker.stop()
+        cancel_scans()
+        job_manager = get_job_manager()
+        job_manager.cancel_all()
+        # Let running items (process pools, .part files being written) finish before the interpreter exits
+        if not job_manager.wait(JOB_SHUTDOWN_TIMEOUT_MS):
+            logger.warning(f"Background jobs still running after {JOB_SHUTDOWN_TIMEOUT_MS / 1000:.0f} s; closing anyway.")
+        shutdown_async_bridge()
+        shutdown_io_executor()
+        wipe_derived_keys()
         logger.info("Application is closing. Stopping InternetChecker.")
         super().closeEvent(event)
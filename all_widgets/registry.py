@@ -1,6 +1,51 @@
 import json
 from importlib import import_module
-from PySide6.QtWidgets import QStackedWidget
+from PySide6.QtWidgets import QStackedWidget, QWidget, QVBoxLayout, QLabel
+from PySide6.QtCore import Qt
+from config.logging_config import get_logger
+from modules.startup_profiler import profiler
+
+logger = get_logger(__name__)
+
+
+class AppDescriptor:
+    """Lightweight description of an app that has not been constructed yet."""
+
+    def __init__(self, name, module_path, class_name, icon_path=None, parent_name=None):
+        self.name = name
+        self.module_path = module_path
+        self.class_name = class_name
+        self.icon_path = icon_path
+        self.parent_name = parent_name
+
+    def build(self):
+        """Import the app module and construct the real widget."""
+        with profiler.phase(f"import {self.module_path}"):
+            module = import_module(self.module_path)
+        app_class = getattr(module, self.class_name)
+        with profiler.phase(f"construct {self.class_name}"):
+            widget = app_class()
+        if self.icon_path:
+            widget.icon_path = self.icon_path
+        return widget
+
+
+class LazyAppPage(QWidget):
+    """Placeholder page registered in place of an app until it is first opened."""
+
+    def __init__(self, descriptor):
+        super().__init__()
+        self.descriptor = descriptor
+        self.icon_path = descriptor.icon_path
+        self.setObjectName(descriptor.name)
+
+        self.label = QLabel(f"Loading {descriptor.name}...")
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.label)
+        self.setLayout(layout)
+
 
 class AppRegistry:
     _apps = {}
@@ -38,9 +83,33 @@ class AppRegistry:
         """Retrieve all sub-apps."""
         return AppRegistry._sub_apps
 
-
-def load_apps_from_config(config_path):
-    """Load apps and sub-apps dynamically from a JSON configuration file."""
+    @staticmethod
+    def materialize(widget):
+        """
+        Build the real widget behind a LazyAppPage and re-register it.
+        Returns the widget unchanged if it is already a real app.
+        """
+        if not isinstance(widget, LazyAppPage):
+            return widget
+
+        descriptor = widget.descriptor
+        real_widget = descriptor.build()
+        real_widget.setObjectName(descriptor.name)
+
+        if descriptor.parent_name is None:
+            AppRegistry.register_app(descriptor.name, real_widget)
+        else:
+            AppRegistry.register_sub_app(descriptor.parent_name, descriptor.name, real_widget)
+        return real_widget
+
+
+def load_apps_from_config(config_path, lazy=False):
+    """
+    Load apps and sub-apps dynamically from a JSON configuration file.
+
+    With lazy=True, apps are registered as LazyAppPage placeholders and only
+    imported and constructed when first selected (see AppRegistry.materialize).
+    """
     with open(config_path, "r") as file:
         config = json.load(file)
 
@@ -54,13 +123,9 @@ def load_apps_from_config(config_path):
             if app_config["class"] == "QStackedWidget":
                 widget = QStackedWidget()
                 widget.icon_path = app_config["icon"]
-                # print(f"Main app registered: {app_config['name']} (as QStackedWidget)")
             else:
-                module = import_module(module_path)
-                app_class = getattr(module, app_config["class"])
-                widget = app_class()
-                widget.icon_path = app_config["icon"]
-                # print(f"Main app registered: {app_config['name']} (as {app_config['class']})")
+                descriptor = AppDescriptor(app_config["name"], module_path, app_config["class"], app_config["icon"])
+                widget = LazyAppPage(descriptor) if lazy else descriptor.build()
 
             # Register the main app
             AppRegistry.register_app(app_config["name"], widget)
@@ -73,9 +138,11 @@ def load_apps_from_config(config_path):
                         sub_app_directory = sub_app_config.get("directory", "sub_apps")
                         sub_module_path = f"all_widgets.{directory}.{sub_app_directory}"
 
-                        sub_module = import_module(sub_module_path)
-                        sub_app_class = getattr(sub_module, sub_app_config["class"])
-                        sub_widget = sub_app_class()
+                        sub_descriptor = AppDescriptor(
+                            sub_app_config["name"], sub_module_path, sub_app_config["class"],
+                            parent_name=app_config["name"]
+                        )
+                        sub_widget = LazyAppPage(sub_descriptor) if lazy else sub_descriptor.build()
                         sub_widget.setObjectName(sub_app_config["name"])
 
                         AppRegistry.register_sub_app(app_config["name"], sub_app_config["name"], sub_widget)
@@ -83,16 +150,7 @@ def load_apps_from_config(config_path):
                         # Add sub-app to the main app if it's a QStackedWidget
                         if isinstance(widget, QStackedWidget):
                             widget.addWidget(sub_widget)
-                            # print(f"Sub-app registered: {sub_app_config['name']} under {app_config['name']}")
                     except Exception as e:
-                        pass
-                        # print(f"Error loading sub-app {sub_app_config['name']}: {e}")
+                        logger.error(f"Error loading sub-app {sub_app_config['name']}: {e}", exc_info=True)
         except Exception as e:
-            pass
-            # print(f"Error loading app {app_config['name']}: {e}")
-
-
-
-
-
-
+            logger.error(f"Error loading app {app_config['name']}: {e}", exc_info=True)
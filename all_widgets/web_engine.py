@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+from PySide6.QtCore import QCoreApplication, QTimer, Qt
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# QtWebEngine pulls in Chromium and spawns its helper process, so nothing in here
+# imports it until a web app is actually shown (or the optional warm-up runs).
+_web_engine = None
+_history_page_class = None
+_spare_view = None
+
+
+def prepare_web_engine():
+    """
+    Allow QtWebEngine to be imported after the QApplication exists.
+    Must be called before QApplication is created.
+    """
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+
+
+def load_web_engine():
+    """Import the QtWebEngine classes on first use and cache them."""
+    global _web_engine
+    if _web_engine is None:
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+        from PySide6.QtWebEngineCore import QWebEnginePage, QWebEngineSettings
+        _web_engine = SimpleNamespace(
+            QWebEngineView=QWebEngineView,
+            QWebEnginePage=QWebEnginePage,
+            QWebEngineSettings=QWebEngineSettings,
+        )
+        logger.info("QtWebEngine loaded.")
+    return _web_engine
+
+
+def create_web_view():
+    """Return a QWebEngineView, handing out the warmed-up view if there is one."""
+    global _spare_view
+    if _spare_view is not None:
+        view, _spare_view = _spare_view, None
+        return view
+    return load_web_engine().QWebEngineView()
+
+
+def create_history_page(parent=None):
+    """Create a QWebEnginePage that always allows back navigation."""
+    global _history_page_class
+    if _history_page_class is None:
+        QWebEnginePage = load_web_engine().QWebEnginePage
+
+        class WebEnginePageWithHistory(QWebEnginePage):
+            def __init__(self, parent=None):
+                super().__init__(parent)
+
+            def canGoBack(self):
+                """Override canGoBack to enable back navigation."""
+                return True
+
+        _history_page_class = WebEnginePageWithHistory
+    return _history_page_class(parent)
+
+
+def warm_up_web_engine(delay_ms=3000):
+    """Import QtWebEngine and start Chromium in the background once the window is idle."""
+    QTimer.singleShot(delay_ms, _warm_up)
+
+
+def _warm_up():
+    global _spare_view
+    if _spare_view is not None:
+        return
+    try:
+        _spare_view = load_web_engine().QWebEngineView()
+        _spare_view.setHtml("")  # Forces the profile and renderer process to start
+        logger.info("QtWebEngine warmed up.")
+    except Exception as e:
+        logger.warning(f"QtWebEngine warm-up failed: {e}")
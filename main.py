@@ -1,24 +1,50 @@
+import argparse
+import os
 import sys
+from modules.startup_profiler import profiler, FirstPaintWatcher
 from PySide6.QtWidgets import QApplication
 from all_widgets.main_window import MainWindow
 from all_widgets.registry import load_apps_from_config
+from all_widgets.web_engine import prepare_web_engine, warm_up_web_engine
 from config.logging_config import get_logger, LoggingManager, rotate_logs, create_logging_config, get_current_log_file
-import resources.resources
+from resources.loader import register_resources
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mheepeem's Universal App")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Record per-phase startup timings to the log and a JSON file.")
+    # Anything we don't know about is left for Qt
+    return parser.parse_known_args()
 
 def main():
-    rotate_logs()
+    args, qt_args = parse_args()
+    if args.profile_startup:
+        profiler.enable()
+
+    with profiler.phase("rotate_logs"):
+        rotate_logs()
     log_file = get_current_log_file()
-    logging_config = create_logging_config()
-    log_manager = LoggingManager(logging_config, log_file)
+    with profiler.phase("create_logging_config"):
+        logging_config = create_logging_config()
+        log_manager = LoggingManager(logging_config, log_file)
     log_manager.log_start()
 
     logger = get_logger(__name__)
 
     try:
-        app = QApplication(sys.argv)
-        load_apps_from_config("config/apps_config.json")
-        window = MainWindow(app)
+        with profiler.phase("register_resources"):
+            register_resources()
+        prepare_web_engine()
+        app = QApplication(sys.argv[:1] + qt_args)
+        with profiler.phase("load_apps_from_config"):
+            load_apps_from_config("config/apps_config.json", lazy=True)
+        with profiler.phase("MainWindow.__init__"):
+            window = MainWindow(app)
+        if args.profile_startup:
+            FirstPaintWatcher(window, profiler)
         window.show()
+        if os.getenv("WEBENGINE_WARMUP", "0") == "1":
+            warm_up_web_engine()
         logger.info("Application is running...")
         sys.exit(app.exec())
     finally:
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from PySide6.QtCore import QObject, Signal
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncBridge(QObject):
+    """
+    Run coroutines, such as the async file functions of modules.os, on an asyncio event loop
+    in a background thread, and hand their results back to the GUI thread.
+
+    Widgets write their I/O as coroutines and pass a callback for the result:
+
+        async def load(paths):
+            return [data async for _, data, _ in amap_files(aread_file, paths, limit=32)]
+
+        get_async_bridge().run(load(paths), self.show_files, self.show_error)
+
+    The coroutines run off the GUI thread, so they must not touch widgets; the callbacks
+    are called on the GUI thread through a queued signal.
+    """
+
+    _done = Signal(object, object)  # callback, its argument
+
+    def __init__(self):
+        super().__init__()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="asyncio", daemon=True)
+        self.thread.start()
+        self._done.connect(self._deliver)
+
+    def run(self, coro, on_result=None, on_error=None):
+        """
+        Schedule coro on the loop. on_result(result) or on_error(message) is called on the GUI
+        thread when it is done. Returns a concurrent.futures.Future; cancel() abandons the coroutine.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        def done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                self._done.emit(on_result, future.result())
+            else:
+                logger.error(f"Background I/O failed: {error}", exc_info=error)
+                self._done.emit(on_error, str(error))
+
+        future.add_done_callback(done)
+        return future
+
+    def _deliver(self, callback, value):
+        if callback is not None:
+            callback(value)
+
+    def shutdown(self, timeout=2.0):
+        """Cancel the running coroutines and stop the loop (used on shutdown)."""
+        def stop():
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.stop()
+
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(stop)
+            self.thread.join(timeout)
+
+
+_async_bridge = None
+
+
+def get_async_bridge():
+    """Process-wide AsyncBridge, created on first use."""
+    global _async_bridge
+    if _async_bridge is None:
+        _async_bridge = AsyncBridge()
+    return _async_bridge
+
+
+def shutdown_async_bridge():
+    """Stop the bridge's event loop if it was ever started."""
+    if _async_bridge is not None:
+        _async_bridge.shutdown()
@@ -0,0 +1,381 @@
+import base64
+import io
+import json
+import os
+import time
+from collections import deque
+from modules.os import read_file, write_file, get_file_type, map_file, sniff_file
+from modules.manifest import default_manifest_path
+from modules.security import (
+    encrypt_json_values, decrypt_json_values, encrypt_json_stream, decrypt_json_stream, encrypt_buffer, decrypt_buffer,
+    encrypt_stream, decrypt_stream, is_stream_encrypted, STREAM_MAGIC,
+    is_fernet_key, passphrase_key, key_fingerprint, key_from_header, is_passphrase_encrypted, KDF_HEADER_SIZE,
+    rekey_stream, rotate_token, value_rotator, transform_json_values, transform_json_stream, FERNET_VERSION
+)
+from cryptography.fernet import InvalidToken
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ENCRYPT = "Encrypt"
+DECRYPT = "Decrypt"
+
+# Output formats for non-JSON files
+# FERNET stays the default: any Fernet implementation (and older versions of this app) can read it,
+# while CHUNKED and FERNET_RAW files can only be decrypted by this app.
+FERNET = "Fernet token"   # The whole file as one base64 Fernet token
+CHUNKED = "Chunked"       # Streaming authenticated segments, constant memory (see modules.security)
+FERNET_RAW = "Fernet raw" # The same token without base64, a third smaller
+
+# JSON files from this size on are transformed as a stream instead of being loaded.
+# Streamed files keep their exact formatting; smaller ones are rewritten with indent=4.
+JSON_STREAM_THRESHOLD = 16 * 1024 * 1024
+
+
+def get_manifest_name(action):
+    """File name of the incremental-run manifest for an action (see modules.manifest)."""
+    return f".cryptit_manifest_{action.lower()}.json"
+
+
+def get_manifest_settings(key, action, fmt):
+    """
+    Settings a manifest records with each file (see modules.manifest): the action, the format and
+    a fingerprint of the key, so that a run with other settings processes every file again.
+    """
+    return f"{action}|{fmt}|{key_fingerprint(key, f'cryptit manifest|{action}|{fmt}')}"
+
+
+def resolve_key(key=None):
+    """
+    Return the given key, or CRYPTO_KEY from the environment if none was given.
+    Either may be a Fernet key or a passphrase.
+    """
+    key = key if key else os.environ.get('CRYPTO_KEY')
+    if not key:
+        raise ValueError("No encryption key provided. Please set CRYPTO_KEY or enter a key manually.")
+    return key
+
+
+def get_output_path(file_path, action):
+    """Output path next to the input: encrypted_<name> or decrypted_<name>."""
+    dir = os.path.dirname(file_path)
+    filename = os.path.basename(file_path)
+    if action == ENCRYPT:
+        new_filename = "encrypted_" + filename
+    else:
+        new_filename = "decrypted_" + filename.replace('encrypted_', '')
+    return os.path.join(dir, new_filename)
+
+
+def _write_output(output_path, write):
+    """Call write(dst) on a temp file and move it to output_path only once it is complete."""
+    temp_path = output_path + ".part"
+    try:
+        with open(temp_path, 'wb') as dst:
+            write(dst)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return output_path
+
+
+def get_file_key(file_path, key, action=ENCRYPT, kdf=None):
+    """
+    Resolve a Fernet key or passphrase for one file. Returns (Fernet key, header, offset):
+    when encrypting with a passphrase, header is the KDF header to write in front of the output;
+    when decrypting a passphrase file, offset is where the encrypted data starts after its header.
+    Derived keys are cached, so a batch with one passphrase runs the KDF once.
+    """
+    if action == ENCRYPT:
+        if is_fernet_key(key):
+            return key, b"", 0
+        key, header = passphrase_key(key, kdf)
+        return key, header, 0
+
+    with open(file_path, 'rb') as file:
+        head = file.read(KDF_HEADER_SIZE)
+    if is_passphrase_encrypted(head):
+        return key_from_header(key, head), b"", KDF_HEADER_SIZE
+    return key, b"", 0
+
+
+def stream_crypt_file(input_path, output_path, key, action=ENCRYPT, header=b"", offset=0):
+    """
+    Encrypt or decrypt input_path into output_path with the chunked stream format.
+    Streams disk to disk; the output only appears under its final name once complete.
+    header is written before the encrypted data; offset bytes of the input are skipped.
+    """
+    def write(dst):
+        with open(input_path, 'rb') as src:
+            dst.write(header)
+            src.seek(offset)
+            if action == ENCRYPT:
+                encrypt_stream(src, dst, key)
+            else:
+                decrypt_stream(src, dst, key)
+    return _write_output(output_path, write)
+
+
+def fernet_crypt_file(input_path, output_path, key, action=ENCRYPT, raw=False, header=b"", offset=0):
+    """
+    Encrypt or decrypt input_path into output_path as a single Fernet token.
+    The input is memory-mapped and handled as bytes, so binary files survive unchanged.
+    raw=True writes the token bytes instead of base64; decryption accepts either.
+    header and offset work as in stream_crypt_file.
+    """
+    def write(dst):
+        with map_file(input_path) as data:
+            dst.write(header)
+            if action == ENCRYPT:
+                encrypt_buffer(memoryview(data)[offset:], key, dst, raw=raw)
+            else:
+                decrypt_buffer(memoryview(data)[offset:], key, dst)
+    return _write_output(output_path, write)
+
+
+def json_stream_crypt_file(input_path, output_path, key, action=ENCRYPT, kdf=None):
+    """
+    Encrypt or decrypt the string values of a JSON file without loading it.
+    Everything but the values is copied byte for byte. Returns (output_path, stats).
+    """
+    stats = {}
+
+    def write(dst):
+        with open(input_path, 'r', encoding='utf-8', newline='') as src:
+            out = io.TextIOWrapper(dst, encoding='utf-8', newline='')
+            if action == ENCRYPT:
+                stats.update(encrypt_json_stream(src, out, key, kdf))
+            else:
+                stats.update(decrypt_json_stream(src, out, key))
+            out.flush()
+            out.detach()  # Leave closing the file to _write_output
+    return _write_output(output_path, write), stats
+
+
+def is_stream_encrypted_file(file_path, offset=0):
+    """True if the file has the chunked stream header at offset."""
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        return is_stream_encrypted(file.read(len(STREAM_MAGIC)))
+
+
+def crypt_file(file_path, key, action=ENCRYPT, fmt=FERNET, kdf=None):
+    """
+    Encrypt or decrypt a single file and save the result next to it.
+    JSON files keep their structure and only have their string values processed.
+    Other files are encrypted in the given format; decryption detects the format.
+    key may be a Fernet key or a passphrase (derived with kdf, scrypt by default).
+    Returns the output path, or None if the file had no data.
+    """
+    info = sniff_file(file_path)
+    if not info.is_json:
+        if info.size == 0:
+            logger.warning(f"No data found in file: {file_path}")
+            return None
+        output_path = get_output_path(file_path, action)
+        file_key, header, offset = get_file_key(file_path, key, action, kdf)
+        if (action == ENCRYPT and fmt == CHUNKED) or (action == DECRYPT and is_stream_encrypted_file(file_path, offset)):
+            save_path = stream_crypt_file(file_path, output_path, file_key, action, header, offset)
+        else:
+            save_path = fernet_crypt_file(file_path, output_path, file_key, action, fmt == FERNET_RAW, header, offset)
+        logger.info(f"Processed file '{file_path}'. Saved as '{save_path}'.")
+        return save_path
+
+    if info.size >= JSON_STREAM_THRESHOLD:
+        save_path, stats = json_stream_crypt_file(file_path, get_output_path(file_path, action), key, action, kdf)
+        logger.info(f"{action}ed {stats['values']} values of '{file_path}' as a stream in {stats['seconds']} s "
+                    f"({stats['values_per_second']} values/s, {stats['mb_per_second']} MB/s).")
+        logger.info(f"Processed file '{file_path}'. Saved as '{save_path}'.")
+        return save_path
+
+    logger.info(f"Reading file: {file_path}")
+    data = read_file(file_path, info=info)
+    if not data:
+        logger.warning(f"No data found in file: {file_path}")
+        return None
+
+    # Encryption, Decryption
+    if action == ENCRYPT:
+        data, stats = encrypt_json_values(data, key, kdf=kdf)
+    else:
+        data, stats = decrypt_json_values(data, key)
+    logger.info(f"{action}ed {stats['values']} values of '{file_path}' in {stats['seconds']} s "
+                f"({stats['values_per_second']} values/s, {stats['mb_per_second']} MB/s).")
+
+    # Write new file
+    save_path = get_output_path(file_path, action)
+    write_file(save_path, data)
+    logger.info(f"Processed file '{file_path}'. Saved as '{save_path}'.")
+    return save_path
+
+
+# Key rotation: files are re-encrypted in place under a new key, one temp file + rename each
+ROTATED = "Rotated"
+ALREADY_ROTATED = "Already rotated"
+SKIPPED = "Skipped (in journal)"
+ROTATION_JOURNAL_NAME = ".cryptit_rotation.jsonl"
+
+
+class _NullSink:
+    """Binary or text file object that discards everything, for checking that data decrypts."""
+
+    def write(self, data):
+        return len(data)
+
+
+def _decrypts_with(file_path, key):
+    """True if the whole file decrypts with key."""
+    try:
+        if get_file_type(file_path) == 'application/json':
+            with open(file_path, 'r', encoding='utf-8', newline='') as src:
+                decrypt_json_stream(src, _NullSink(), key)
+            return True
+        file_key, _, offset = get_file_key(file_path, key, DECRYPT)
+        if is_stream_encrypted_file(file_path, offset):
+            with open(file_path, 'rb') as src:
+                src.seek(offset)
+                decrypt_stream(src, _NullSink(), file_key)
+        else:
+            with map_file(file_path) as data:
+                decrypt_buffer(memoryview(data)[offset:], file_key, _NullSink())
+        return True
+    except (InvalidToken, ValueError):
+        return False
+
+
+def _rotate_json_file(file_path, old_key, new_key, kdf=None):
+    rotate = value_rotator(old_key, new_key, kdf)
+    if os.path.getsize(file_path) >= JSON_STREAM_THRESHOLD:
+        def write(dst):
+            with open(file_path, 'r', encoding='utf-8', newline='') as src:
+                out = io.TextIOWrapper(dst, encoding='utf-8', newline='')
+                transform_json_stream(src, out, rotate)
+                out.flush()
+                out.detach()
+    else:
+        data, _ = transform_json_values(read_file(file_path), rotate)
+
+        def write(dst):
+            out = io.TextIOWrapper(dst, encoding='utf-8')
+            json.dump(data, out, indent=4, ensure_ascii=False)
+            out.flush()
+            out.detach()
+    return _write_output(file_path, write)
+
+
+def _rotate_file(file_path, old_key, new_key, kdf=None):
+    if get_file_type(file_path) == 'application/json':
+        return _rotate_json_file(file_path, old_key, new_key, kdf)
+
+    old_file_key, _, offset = get_file_key(file_path, old_key, DECRYPT)
+    new_file_key, header, _ = get_file_key(file_path, new_key, ENCRYPT, kdf)
+    stream = is_stream_encrypted_file(file_path, offset)
+
+    def write(dst):
+        dst.write(header)
+        with open(file_path, 'rb') as src:
+            src.seek(offset)
+            if stream:
+                rekey_stream(src, dst, old_file_key, new_file_key)
+                return
+            token = src.read()
+        raw = token[:1] == FERNET_VERSION
+        rotated = rotate_token(base64.urlsafe_b64encode(token) if raw else token.strip(), old_file_key, new_file_key)
+        dst.write(base64.urlsafe_b64decode(rotated) if raw else rotated)
+    return _write_output(file_path, write)
+
+
+def rotate_file(file_path, old_key, new_key, kdf=None):
+    """
+    Re-encrypt an encrypted file in place under new_key; plaintext never touches the disk.
+    Chunked files are re-keyed segment by segment, Fernet-format files are rotated in memory
+    with MultiFernet.rotate (keeping their raw or base64 form) and JSON files value by value.
+    Either key may be a passphrase. The file is replaced atomically.
+    Returns ROTATED, or ALREADY_ROTATED for a file that only decrypts with new_key.
+    """
+    try:
+        _rotate_file(file_path, old_key, new_key, kdf)
+    except (InvalidToken, ValueError):
+        if _decrypts_with(file_path, new_key):  # e.g. replaced just before an interruption
+            return ALREADY_ROTATED
+        raise
+    logger.info(f"Rotated key of '{file_path}'.")
+    return ROTATED
+
+
+def default_journal_path(file_paths):
+    """Journal next to the files being rotated, in their common directory (folders count as their own)."""
+    return default_manifest_path(file_paths, ROTATION_JOURNAL_NAME)
+
+
+class RotationJournal:
+    """
+    Append-only record of rotated files, one JSON line per file, flushed as it is written.
+    Running the same rotation again with the journal skips everything already recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        self.done.add(json.loads(line)["path"])
+                    except (ValueError, KeyError):
+                        pass  # A line cut short by a crash
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, file_path):
+        return os.path.abspath(file_path) in self.done
+
+    def record(self, file_path, status):
+        self.file.write(json.dumps({"path": os.path.abspath(file_path), "status": status, "time": time.time()}) + "\n")
+        self.file.flush()
+
+    def close(self, remove=False):
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+
+
+def map_with_journal(journal_path, map_func):
+    """
+    Wrap a job mapper (map_func(func, items) yielding (item, result, error)) for a rotation:
+    items found in the journal are skipped, finished items are recorded as they arrive and
+    the journal is deleted once every item has succeeded.
+    """
+    def mapper(func, items):
+        journal = RotationJournal(journal_path)
+        skipped = deque()  # Reported along with the next rotated file
+        outcomes = None
+        succeeded = False
+
+        def pending_items():
+            for item in items:
+                if item in journal:
+                    skipped.append(item)
+                elif os.path.abspath(item) != os.path.abspath(journal_path):
+                    yield item
+
+        try:
+            failed = False
+            outcomes = map_func(func, pending_items())
+            for item, result, error in outcomes:
+                while skipped:
+                    yield skipped.popleft(), SKIPPED, None
+                if error is None:
+                    journal.record(item, result)
+                else:
+                    failed = True
+                yield item, result, error
+            while skipped:
+                yield skipped.popleft(), SKIPPED, None
+            succeeded = not failed
+        finally:
+            if outcomes is not None:
+                outcomes.close()
+            journal.close(remove=succeeded)
+    return mapper
@@ -0,0 +1,179 @@
+import itertools
+import threading
+import time
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobSignals(QObject):
+    """
+    Signals emitted by a Job. They are emitted from the worker thread and
+    delivered to receivers on the GUI thread through queued connections.
+    """
+    started = Signal(int)                    # job id
+    progress = Signal(int, int, int, str)    # job id, items done, total items (0 if unknown), current item
+    item_finished = Signal(int, str, object)  # job id, item, result
+    item_failed = Signal(int, str, str)      # job id, item, error message
+    finished = Signal(int, dict)             # job id, summary
+
+
+class Job(QRunnable):
+    """
+    Run func(item) for every item on a worker thread.
+
+    Failures are recorded per item and do not stop the job. cancel() stops the job
+    before the next item starts, or before the first one if the job is still queued.
+    If finalize is given, it is called on the worker thread with the list of
+    (item, result) pairs once every item succeeded.
+
+    map_func(func, items) decides where the items run. It must yield (item, result, error)
+    in input order; the default, modules.utilities.map_serial, runs them on the job's thread, while
+    modules.utilities.map_in_process_pool spreads them over worker processes.
+    """
+
+    def __init__(self, job_id, name, items, func, finalize=None, map_func=None):
+        super().__init__()
+        self.setAutoDelete(False)  # The JobManager keeps the job for the job list
+        self.job_id = job_id
+        self.name = name
+        self.items = items
+        self.func = func
+        self.finalize = finalize
+        if map_func is None:
+            from modules.utilities import map_serial  # Pulls in the PDF libraries, so only when needed
+            map_func = map_serial
+        self.map_func = map_func
+        self.signals = JobSignals()
+        self.status = "Queued"
+        self.summary = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Request cancellation. The item currently being processed is allowed to finish."""
+        self._cancel_event.set()
+        logger.info(f"Cancellation requested for job '{self.name}' (id {self.job_id}).")
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        self.status = "Running"
+        self.signals.started.emit(self.job_id)
+        logger.info(f"Job '{self.name}' (id {self.job_id}) started.")
+
+        start = time.perf_counter()
+        total = len(self.items) if hasattr(self.items, "__len__") else 0
+        results = []
+        errors = []
+        done = 0
+
+        outcomes = None
+        try:
+            # A job cancelled while queued never starts its mapper (which may spawn a process pool)
+            if not self.cancelled:
+                outcomes = self.map_func(self.func, self.items)
+            for item, result, error in outcomes or ():
+                if error is None:
+                    results.append((item, result))
+                    self.signals.item_finished.emit(self.job_id, str(item), result)
+                else:
+                    errors.append({"item": str(item), "error": error})
+                    self.signals.item_failed.emit(self.job_id, str(item), error)
+                done += 1
+                self.signals.progress.emit(self.job_id, done, total, str(item))
+                if self.cancelled:
+                    break
+        except Exception as e:
+            # The mapper itself failed (e.g. a broken process pool), not one item
+            errors.append({"item": "(job)", "error": str(e)})
+            logger.error(f"Job '{self.name}' failed: {e}", exc_info=True)
+        finally:
+            if outcomes is not None:
+                outcomes.close()  # Stops a process pool from starting the remaining items
+
+        final_result = None
+        if self.finalize and not self.cancelled and not errors and results:
+            try:
+                final_result = self.finalize(results)
+            except Exception as e:
+                errors.append({"item": "(finalize)", "error": str(e)})
+                logger.error(f"Job '{self.name}' failed while finalizing: {e}", exc_info=True)
+
+        self.status = "Cancelled" if self.cancelled else ("Failed" if errors else "Done")
+        self.summary = {
+            "name": self.name,
+            "status": self.status,
+            "succeeded": len(results),
+            "failed": len(errors),
+            "errors": errors,
+            "results": [(str(item), result) for item, result in results],
+            "final_result": final_result,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        logger.info(f"Job '{self.name}' (id {self.job_id}) {self.status.lower()}: "
+                    f"{len(results)} succeeded, {len(errors)} failed in {self.summary['seconds']} s.")
+        self.signals.finished.emit(self.job_id, self.summary)
+
+
+class JobManager(QObject):
+    """Shared queue of background jobs backed by a QThreadPool."""
+
+    job_added = Signal(object)  # Job
+
+    def __init__(self, max_concurrent_jobs=2):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_concurrent_jobs)
+        self.jobs = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, name, items, func, finalize=None, on_finished=None, map_func=None):
+        """
+        Queue a job and return it.
+        on_finished(job_id, summary) is connected before the job starts, so it cannot be missed.
+        """
+        job = Job(next(self._ids), name, items, func, finalize, map_func)
+        if on_finished:
+            job.signals.finished.connect(on_finished)
+        self.jobs[job.job_id] = job
+        self.job_added.emit(job)
+        self.pool.start(job)
+        return job
+
+    def cancel_all(self):
+        for job in self.jobs.values():
+            job.cancel()
+
+    def clear_finished(self):
+        """Forget jobs that are no longer queued or running."""
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.summary is not None]:
+            del self.jobs[job_id]
+
+    def wait(self, msecs=-1):
+        """Block until all jobs are done (used on shutdown)."""
+        return self.pool.waitForDone(msecs)
+
+
+_job_manager = None
+
+
+def get_job_manager():
+    """Process-wide JobManager shared by all apps."""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
+
+
+def format_job_summary(summary, max_errors=10):
+    """Human-readable summary for a message box."""
+    lines = [f"{summary['status']}: {summary['succeeded']} succeeded, {summary['failed']} failed "
+             f"({summary['seconds']} s)."]
+    for error in summary["errors"][:max_errors]:
+        lines.append(f"- {error['item']}: {error['error']}")
+    if len(summary["errors"]) > max_errors:
+        lines.append(f"... and {len(summary['errors']) - max_errors} more.")
+    return "\n".join(lines)
@@ -0,0 +1,158 @@
+import json
+import os
+import time
+from collections import deque
+from functools import partial
+from modules.os import hash_file, get_file_record
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_VERSION = 1
+SAVE_EVERY = 500  # Write the manifest after this many new records, so an interruption loses little
+UNCHANGED = "Unchanged (manifest)"
+
+# A file modified within this many seconds of being recorded can change again without its
+# size or mtime changing (coarse filesystem timestamps), so its stat alone proves nothing.
+MTIME_GRANULARITY = 2.0
+
+
+def fingerprint_file(file_path):
+    """
+    (size, mtime_ns, hash) of a file, stat taken before hashing. Taken from the shared file index,
+    which hashes the file only if it changed since it was indexed; read directly if the index cannot be used.
+    """
+    record = get_file_record(file_path)
+    if record is not None:
+        return record.size, record.mtime_ns, record.content_hash
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns, hash_file(file_path)
+
+
+class Manifest:
+    """
+    Record of processed files: path -> size, mtime, content hash, output path, settings and when it
+    was recorded. A file is unchanged if it was processed with the same settings (a string such as
+    crypt_files.get_manifest_settings()), its size and mtime match and its output still exists; the
+    hash is only read when the stat is ambiguous (same size, but a different or too recent mtime).
+    """
+
+    def __init__(self, path, settings=None):
+        self.path = path
+        self.settings = settings
+        self.files = {}
+        self.pending = 0
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    data = json.load(file)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.files = data["files"]
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable manifest '{path}': {e}")
+
+    def is_unchanged(self, file_path):
+        entry = self.files.get(os.path.abspath(file_path))
+        if entry is None or entry.get("settings") != self.settings or not os.path.exists(entry["output"]):
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"] and entry["mtime_ns"] / 1e9 < entry["recorded"] - MTIME_GRANULARITY:
+            return True
+
+        # Ambiguous: same size but touched, or modified too close to when it was recorded
+        if fingerprint_file(file_path)[2] != entry["hash"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["recorded"] = time.time()
+        self._changed()
+        return True
+
+    def record(self, file_path, output, fingerprint):
+        """Remember a processed file; fingerprint is fingerprint_file() taken before processing."""
+        size, mtime_ns, digest = fingerprint
+        self.files[os.path.abspath(file_path)] = {
+            "size": size, "mtime_ns": mtime_ns, "hash": digest, "output": os.path.abspath(output),
+            "settings": self.settings, "recorded": time.time(),
+        }
+        self._changed()
+
+    def _changed(self):
+        self.pending += 1
+        if self.pending >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        """Write the manifest atomically."""
+        temp_path = self.path + ".part"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, file)
+        os.replace(temp_path, self.path)
+        self.pending = 0
+
+
+def default_manifest_path(paths, name):
+    """Manifest file with the given name in the common directory of the paths (folders count as their own)."""
+    directory = os.path.commonpath([os.path.abspath(path) if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+                                    for path in paths])
+    return os.path.join(directory, name)
+
+
+def process_with_fingerprint(func, file_path):
+    """Fingerprint a file, then process it. Returns (func(file_path), fingerprint)."""
+    fingerprint = fingerprint_file(file_path)
+    return func(file_path), fingerprint
+
+
+def map_with_manifest(manifest_path, map_func=None, settings=None):
+    """
+    Wrap a job mapper (map_func(func, items) yielding (item, result, error)) for incremental runs:
+    unchanged files are reported as UNCHANGED without being processed, and processed files
+    are recorded with the fingerprint taken just before they were processed. func must return
+    the output path. Outputs of earlier runs (e.g. in a re-scanned folder) are left out.
+    Files recorded with other settings than the given ones (see Manifest) count as changed.
+    Without map_func the files are processed one after another.
+    """
+    if map_func is None:
+        from modules.utilities import map_serial  # Pulls in the PDF libraries, so only when needed
+        map_func = map_serial
+
+    def mapper(func, items):
+        manifest = Manifest(manifest_path, settings)
+        unchanged = deque()  # Reported along with the next processed file
+        outcomes = None
+
+        def changed_items():
+            ignored = {entry["output"] for entry in manifest.files.values()}
+            ignored.add(os.path.abspath(manifest_path))
+            for item in items:
+                if os.path.abspath(item) in ignored:
+                    continue
+                if manifest.is_unchanged(item):
+                    unchanged.append(item)
+                else:
+                    yield item
+
+        try:
+            outcomes = map_func(partial(process_with_fingerprint, func), changed_items())
+            for item, result, error in outcomes:
+                while unchanged:
+                    yield unchanged.popleft(), UNCHANGED, None
+                if error is not None:
+                    yield item, None, error
+                    continue
+                output, fingerprint = result
+                if output is not None:
+                    manifest.record(item, output, fingerprint)
+                yield item, output, None
+            while unchanged:
+                yield unchanged.popleft(), UNCHANGED, None
+        finally:
+            if outcomes is not None:
+                outcomes.close()
+            manifest.save()
+    return mapper
@@ -1,14 +1,54 @@
+import asyncio
+import codecs
+import hashlib
 import mimetypes
+import os
 import json
+import mmap
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
 import chardet
+from config.logging_config import get_logger
 
-#
-def detect_encoding(file_path):
+logger = get_logger(__name__)
+
+ENCODING_SAMPLE_SIZE = 64 * 1024   # Bytes fed to the detector at most; None reads the whole file
+ENCODING_CHUNK_SIZE = 8 * 1024
+ENCODING_CACHE_SIZE = 4096
+_encoding_cache = {}  # path -> (size, mtime_ns, sample_size, result)
+
+# Detect a file's encoding with chardet, feeding it chunks until it is confident or the
+# sample budget is used up. Returns chardet's result dict ({'encoding', 'confidence', 'language'}),
+# cached per file until its size or mtime changes.
+def detect_encoding(file_path, sample_size=ENCODING_SAMPLE_SIZE):
   try:
+    stat = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    cached = _encoding_cache.get(key)
+    if cached and cached[:3] == (stat.st_size, stat.st_mtime_ns, sample_size):
+      return dict(cached[3])
+
+    detector = chardet.UniversalDetector()
+    remaining = stat.st_size if sample_size is None else min(sample_size, stat.st_size)
     with open(file_path, 'rb') as file:  # Open in binary mode for raw bytes
-      raw_data = file.read()
-      result = chardet.detect(raw_data)
-      return result
+      while remaining > 0 and not detector.done:
+        chunk = file.read(min(ENCODING_CHUNK_SIZE, remaining))
+        if not chunk:
+          break
+        detector.feed(chunk)
+        remaining -= len(chunk)
+    result = detector.close()
+
+    if len(_encoding_cache) >= ENCODING_CACHE_SIZE:
+      _encoding_cache.pop(next(iter(_encoding_cache)))  # Drop the oldest entry
+    _encoding_cache[key] = (stat.st_size, stat.st_mtime_ns, sample_size, dict(result))
+    return result
   except FileNotFoundError:
     print(f"Error: File not found: {file_path}")
     return None
@@ -16,38 +56,151 @@ def detect_encoding(file_path):
     print(f"An error occurred: {e}")
     return None
 
-#
+SNIFF_SIZE = 4096                   # Bytes looked at to tell what a file contains
+MMAP_READ_THRESHOLD = 1024 * 1024   # Text files from this size on are decoded straight from a memory map
+
+# Kinds of content found by sniff_file
+EMPTY = "empty"
+JSON = "json"
+TEXT = "text"
+BINARY = "binary"
+
+# Magic bytes of common binary formats, checked before the extension
+_MAGIC_TYPES = [
+  (b"%PDF-", "application/pdf"),
+  (b"PK\x03\x04", None),  # ZIP container (also .docx, .xlsx, ...): the extension says which
+  (b"\x89PNG\r\n\x1a\n", "image/png"),
+  (b"\xff\xd8\xff", "image/jpeg"),
+  (b"GIF87a", "image/gif"),
+  (b"GIF89a", "image/gif"),
+  (b"\x1f\x8b", "application/gzip"),
+  (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+  (b"SQLite format 3\x00", "application/vnd.sqlite3"),
+]
+
+# Bytes found in text; anything else (e.g. NUL or other control bytes) in a file without a BOM means binary
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)))
+
+# Byte order marks; UTF-32 first, as its little-endian BOM starts with UTF-16's
+_BOMS = [
+  (codecs.BOM_UTF32_LE, "utf-32-le"),
+  (codecs.BOM_UTF32_BE, "utf-32-be"),
+  (codecs.BOM_UTF8, "utf-8"),
+  (codecs.BOM_UTF16_LE, "utf-16-le"),
+  (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+# What a file contains, from one look at its first SNIFF_SIZE bytes.
+# kind is EMPTY, JSON, TEXT or BINARY; encoding is None for binary files; bom_size is the
+# number of BOM bytes to skip before decoding.
+@dataclass(frozen=True)
+class FileInfo:
+  path: str
+  size: int
+  mtime_ns: int
+  kind: str
+  mime_type: str
+  encoding: str = None
+  bom_size: int = 0
+
+  @property
+  def is_json(self):
+    return self.kind == JSON
+
+  @property
+  def is_text(self):
+    return self.kind in (JSON, TEXT)
+
+# Tell what a file contains by reading its first few KB once: magic bytes, BOM, and whether
+# the text starts like JSON. The encoding of text without a BOM is UTF-8 if the sample decodes
+# as such, else detect_encoding's guess. Raises OSError if the file cannot be read.
+def sniff_file(file_path):
+  with open(file_path, 'rb') as file:
+    stat = os.fstat(file.fileno())
+    head = file.read(SNIFF_SIZE)
+  guessed_type, _ = mimetypes.guess_type(file_path)
+
+  def info(kind, mime_type, encoding=None, bom_size=0):
+    return FileInfo(file_path, stat.st_size, stat.st_mtime_ns, kind, mime_type, encoding, bom_size)
+
+  if not head:
+    return info(EMPTY, guessed_type or "application/octet-stream")
+  for magic, mime_type in _MAGIC_TYPES:
+    if head.startswith(magic):
+      return info(BINARY, mime_type or guessed_type or "application/zip")
+
+  encoding, bom_size = None, 0
+  for bom, bom_encoding in _BOMS:
+    if head.startswith(bom):
+      encoding, bom_size = bom_encoding, len(bom)
+      break
+  if encoding is None:
+    if head.translate(None, _TEXT_BYTES):
+      return info(BINARY, guessed_type or "application/octet-stream")
+    try:
+      head.decode('utf-8')
+      encoding = 'utf-8'
+    except UnicodeDecodeError as e:
+      if e.reason == 'unexpected end of data' and len(head) == SNIFF_SIZE:
+        encoding = 'utf-8'  # Only a character cut off by the end of the sample
+      else:
+        encoding = (detect_encoding(file_path) or {}).get('encoding')
+        if encoding is None:
+          return info(BINARY, guessed_type or "application/octet-stream")
+
+  text = head[bom_size:].decode(encoding, errors='ignore').lstrip()
+  # The extension wins over the content, so e.g. a log line starting with '[' stays text
+  if guessed_type == 'application/json' or (guessed_type is None and text[:1] in ('{', '[')):
+    return info(JSON, 'application/json', encoding, bom_size)
+  return info(TEXT, guessed_type or 'text/plain', encoding, bom_size)
+
+# MIME type of a file, from its content where that is telling (see sniff_file), else its extension
 def get_file_type(file_path):
   try:
-    mime_type, _ = mimetypes.guess_type(file_path)
-    return mime_type
+    return sniff_file(file_path).mime_type
+  except OSError:
+    return mimetypes.guess_type(file_path)[0]
   except Exception as e:
     print(f"Error determining file type: {e}")
     return None
 
-#
-def read_file(file_path, mode='r', encoding='utf-8'):
+# Read a whole text file with the encoding found by sniff_file, skipping its BOM.
+# Large files are decoded from a memory map, so only the decoded text is held in memory.
+def read_text(info, encoding=None):
+  encoding = encoding or info.encoding or 'utf-8'
+  if info.size >= MMAP_READ_THRESHOLD:
+    with map_file(info.path) as data:
+      view = memoryview(data)
+      try:
+        return str(view[info.bom_size:], encoding)
+      finally:
+        view.release()
+  with open(info.path, 'rb') as file:
+    file.seek(info.bom_size)
+    return str(file.read(), encoding)
+
+# Read a file in one pass. In 'r' mode JSON content is parsed and other text is returned as a
+# string; encoding defaults to the sniffed one. 'rb' returns the raw bytes. info is the file's
+# sniff_file() result, if the caller already has it.
+def read_file(file_path, mode='r', encoding=None, info=None):
   try:
-    # Detect encoding if not provided
-    # with open(file_path, 'rb') as file:
-    #   raw_data = file.read()
-    #   encoding_info = chardet.detect(raw_data)
-    #   encoding = encoding_info['encoding']
-
-    with open(file_path, mode, encoding=encoding) as file:
-      if mode == 'r':
-        try:
-          # Attempt to parse as JSON
-          return json.load(file)
-        except json.JSONDecodeError:
-          # If not JSON, rewind and read as plain text
-          file.seek(0)
-          return file.read()
-      elif mode == 'rb':
+    if mode == 'rb':
+      with open(file_path, 'rb') as file:
         return file.read()  # Return raw bytes for binary mode
-      else:
-        print(f"Unsupported file mode: {mode}")
-        return None
+    if mode != 'r':
+      print(f"Unsupported file mode: {mode}")
+      return None
+
+    info = info or sniff_file(file_path)
+    if info.kind == EMPTY:
+      return ""
+    text = read_text(info, encoding)
+    if info.kind == JSON:
+      try:
+        return json.loads(text)
+      except json.JSONDecodeError:
+        pass  # Looked like JSON but is not; the text is still good
+    return text
 
   except FileNotFoundError:
     print(f"Error: File not found: {file_path}")
@@ -56,6 +209,52 @@ def read_file(file_path, mode='r', encoding='utf-8'):
     print(f"An error occurred: {e}")
     return None
 
+# Yield the files under the given paths. Files are passed through as given; folders are walked
+# recursively with os.scandir (symlinked folders are not followed) and their files are filtered
+# by extensions, e.g. ('.pdf',). Each folder is listed and closed before its files are yielded.
+def iter_files(paths, extensions=None):
+  for path in paths:
+    if not os.path.isdir(path):
+      yield path
+      continue
+    stack = [path]
+    while stack:
+      directory = stack.pop()
+      files, subdirs = [], []
+      try:
+        with os.scandir(directory) as entries:
+          for entry in entries:
+            try:
+              if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+              elif entry.is_file() and (not extensions or os.path.splitext(entry.name)[1].lower() in extensions):
+                files.append(entry.path)
+            except OSError:
+              continue
+      except OSError as e:
+        logger.warning(f"Cannot read folder {directory}: {e}")
+        continue
+      yield from sorted(files)
+      stack.extend(sorted(subdirs, reverse=True))  # Visit subfolders in name order
+
+# Read-only memory map of a file, usable anywhere a bytes-like object is accepted.
+# Nothing is read up front and slices of a memoryview over it are not copied.
+# Empty files cannot be mapped and give b"".
+@contextmanager
+def map_file(file_path):
+  with open(file_path, 'rb') as file:
+    if os.fstat(file.fileno()).st_size == 0:
+      yield b""
+      return
+    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      yield mapped
+    finally:
+      try:
+        mapped.close()
+      except BufferError:
+        pass  # A view is still referenced (e.g. by a traceback); the map closes when it is freed
+
 #
 def write_file(file_path, data, mode='w', encoding='utf-8'):
   try:
@@ -76,3 +275,243 @@ def write_file(file_path, data, mode='w', encoding='utf-8'):
 
   except Exception as e:
     print(f"An error occurred: {e}")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# BLAKE2b hex digest of a file's content, read in chunks
+def hash_file(file_path):
+  digest = hashlib.blake2b(digest_size=32)
+  with open(file_path, 'rb') as file:
+    while chunk := file.read(HASH_CHUNK_SIZE):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+# Sizes (width, height) in points of the pages of a PDF as displayed, i.e. with /Rotate applied.
+# Read with the fastest PDF backend, which does not parse page content. None if the PDF cannot be read
+# (logged as a warning, so stdout stays free for the CLI's results).
+def pdf_page_sizes(file_path):
+  try:
+    from modules.pdf_backend import page_sizes
+    return page_sizes(file_path)
+  except Exception as e:
+    logger.warning(f"Cannot read the pages of {file_path}: {e}")
+    return None
+
+FILE_INDEX_NAME = "file_index.sqlite3"
+FILE_INDEX_SCHEMA = 1
+# A file modified within this many seconds of being indexed can change again without its size
+# or mtime changing (coarse filesystem timestamps), so such entries are not trusted.
+FILE_INDEX_MTIME_GRANULARITY = 2.0
+
+# What the file index knows about a file. page_count and page_sizes are only set for PDFs.
+@dataclass(frozen=True)
+class FileRecord:
+  path: str
+  size: int
+  mtime_ns: int
+  content_hash: str
+  kind: str
+  mime_type: str
+  encoding: str = None
+  page_count: int = None
+  page_sizes: tuple = None
+
+# SQLite index of file metadata: size, mtime, content hash, kind, MIME type, encoding and, for
+# PDFs, page count and sizes. An entry is only used while the file's size and mtime still match,
+# so "what is this file and has it changed" costs a stat and one indexed lookup.
+# Safe to share between threads; other processes open their own FileIndex on the same database.
+class FileIndex:
+  def __init__(self, db_path):
+    self.db_path = db_path
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    self._db.execute("PRAGMA journal_mode=WAL")  # Readers do not wait for writers
+    self._db.execute("PRAGMA synchronous=NORMAL")
+    with self._db:
+      if self._db.execute("PRAGMA user_version").fetchone()[0] != FILE_INDEX_SCHEMA:
+        self._db.execute("DROP TABLE IF EXISTS files")
+      self._db.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+          path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, content_hash TEXT NOT NULL,
+          kind TEXT NOT NULL, mime_type TEXT, encoding TEXT, page_count INTEGER, page_sizes TEXT,
+          indexed REAL NOT NULL
+        )""")
+      self._db.execute(f"PRAGMA user_version = {FILE_INDEX_SCHEMA}")
+
+  # The indexed record of a file if it is still current, else None (also for missing files and
+  # when the database cannot be read, e.g. locked or corrupt)
+  def lookup(self, file_path):
+    path = os.path.abspath(file_path)
+    try:
+      stat = os.stat(path)
+    except OSError:
+      return None
+    try:
+      with self._lock:
+        row = self._db.execute("SELECT * FROM files WHERE path = ?", (path,)).fetchone()
+    except sqlite3.Error as e:
+      logger.warning(f"Cannot read the file index {self.db_path}: {e}")
+      return None
+    if row is None or row[1] != stat.st_size or row[2] != stat.st_mtime_ns:
+      return None
+    if row[2] / 1e9 >= row[9] - FILE_INDEX_MTIME_GRANULARITY:
+      return None  # Indexed right after a change: the stat cannot prove there was no later one
+    page_sizes = tuple(tuple(size) for size in json.loads(row[8])) if row[8] else None
+    return FileRecord(*row[:8], page_sizes)
+
+  # True if the file is not in the index or changed since it was indexed
+  def has_changed(self, file_path):
+    return self.lookup(file_path) is None
+
+  # The record of a file, (re)indexing it if needed; None if the file cannot be read (logged as a warning)
+  def get(self, file_path):
+    record = self.lookup(file_path)
+    if record is not None:
+      return record
+    try:
+      return self.index(file_path)
+    except OSError as e:
+      logger.warning(f"Cannot index {file_path}: {e}")
+      return None
+
+  # Sniff, hash and (for PDFs) read the page sizes of a file, and store the result. The record is
+  # returned even if it cannot be stored (logged as a warning). Raises OSError if the file cannot be read.
+  def index(self, file_path):
+    path = os.path.abspath(file_path)
+    info = sniff_file(path)  # Its stat is taken before hashing, so a change while hashing is noticed later
+    content_hash = hash_file(path)
+    page_sizes = pdf_page_sizes(path) if info.mime_type == 'application/pdf' else None
+    record = FileRecord(path, info.size, info.mtime_ns, content_hash, info.kind, info.mime_type, info.encoding,
+                        len(page_sizes) if page_sizes is not None else None, page_sizes)
+    try:
+      with self._lock, self._db:
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (*(getattr(record, name) for name in ("path", "size", "mtime_ns", "content_hash", "kind",
+                                                              "mime_type", "encoding", "page_count")),
+                          json.dumps(page_sizes) if page_sizes is not None else None, time.time()))
+    except sqlite3.Error as e:
+      logger.warning(f"Cannot store {path} in the file index {self.db_path}: {e}")
+    return record
+
+  def forget(self, file_path):
+    with self._lock, self._db:
+      self._db.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(file_path),))
+
+  # Drop the entries of files that no longer exist. Returns how many were dropped.
+  def prune(self):
+    with self._lock:
+      paths = [row[0] for row in self._db.execute("SELECT path FROM files")]
+    missing = [(path,) for path in paths if not os.path.exists(path)]
+    with self._lock, self._db:
+      self._db.executemany("DELETE FROM files WHERE path = ?", missing)
+    return len(missing)
+
+  def close(self):
+    with self._lock:
+      self._db.close()
+
+_file_index = None
+_file_index_unavailable = False
+_file_index_lock = threading.Lock()
+
+# The file index shared by all apps of this process, in the user's cache folder. None if it cannot
+# be opened (e.g. the cache folder cannot be created or the database is corrupt); logged once.
+def get_file_index():
+  global _file_index, _file_index_unavailable
+  with _file_index_lock:
+    if _file_index is None and not _file_index_unavailable:
+      from platformdirs import user_cache_dir
+      from config.logging_config import APP_NAME, COMPANY_NAME
+      directory = user_cache_dir(APP_NAME, COMPANY_NAME)
+      try:
+        os.makedirs(directory, exist_ok=True)
+        _file_index = FileIndex(os.path.join(directory, FILE_INDEX_NAME))
+      except (OSError, sqlite3.Error) as e:
+        _file_index_unavailable = True
+        logger.warning(f"File index unavailable, files are read directly: {e}")
+    return _file_index
+
+# Best-effort access to the shared index: the current record of a file, or None if the index cannot
+# be used or does not know the file, in which case callers read the file themselves.
+# lookup_file_record only reads the index; get_file_record also indexes the file (hashing it) if needed.
+def lookup_file_record(file_path):
+  index = get_file_index()
+  return index.lookup(file_path) if index is not None else None
+
+def get_file_record(file_path):
+  index = get_file_index()
+  return index.get(file_path) if index is not None else None
+
+# Async facade: the blocking functions above, run on a bounded thread pool so an asyncio
+# event loop (see modules.async_bridge for the GUI) never waits on the disk.
+IO_CONCURRENCY = 16                  # Files in flight at once in amap_files by default
+STREAM_CHUNK_SIZE = 1024 * 1024
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+# Threads of the I/O pool: AIOPU_IO_WORKERS if set (0 for the default), else one per CPU plus 4 (at most 32)
+def get_io_worker_count():
+  default = min(32, (os.cpu_count() or 1) + 4)
+  value = os.getenv("AIOPU_IO_WORKERS")
+  if not value:
+    return default
+  try:
+    return max(1, int(value) or default)
+  except ValueError:
+    logger.warning(f"Ignoring AIOPU_IO_WORKERS={value!r}: not a number. Using {default} I/O threads.")
+    return default
+
+def get_io_executor():
+  global _io_executor
+  with _io_executor_lock:
+    if _io_executor is None:
+      _io_executor = ThreadPoolExecutor(max_workers=get_io_worker_count(), thread_name_prefix="file-io")
+    return _io_executor
+
+# Stop the I/O threads; queued calls are dropped, running ones finish (used on shutdown)
+def shutdown_io_executor():
+  global _io_executor
+  with _io_executor_lock:
+    if _io_executor is not None:
+      _io_executor.shutdown(wait=False, cancel_futures=True)
+      _io_executor = None
+
+async def run_io(func, *args, **kwargs):
+  return await asyncio.get_running_loop().run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+async def aread_file(file_path, mode='r', encoding=None, info=None):
+  return await run_io(read_file, file_path, mode, encoding, info)
+
+async def awrite_file(file_path, data, mode='w', encoding='utf-8'):
+  return await run_io(write_file, file_path, data, mode, encoding)
+
+# Yield a file's bytes in chunks; each read runs on the I/O pool
+async def astream_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE):
+  file = await run_io(open, file_path, 'rb')
+  try:
+    while chunk := await run_io(file.read, chunk_size):
+      yield chunk
+  finally:
+    await run_io(file.close)
+
+# Run the coroutine function func(path) for many files with at most limit in flight, yielding
+# (path, result, error) in input order like the job mappers. Closing the generator early
+# cancels the calls still running.
+async def amap_files(func, paths, limit=IO_CONCURRENCY):
+  async def call(path):
+    try:
+      return path, await func(path), None
+    except Exception as e:
+      return path, None, str(e)
+
+  pending = deque()
+  try:
+    for path in paths:
+      pending.append(asyncio.ensure_future(call(path)))
+      if len(pending) >= limit:
+        yield await pending.popleft()
+    while pending:
+      yield await pending.popleft()
+  finally:
+    for task in pending:
+      task.cancel()
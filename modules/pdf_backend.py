@@ -0,0 +1,355 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+OPERATIONS = ("page_count", "page_sizes", "text", "render", "write")
+
+# Backends tried for each operation, first available wins. pdfium comes first because it only
+# reads the objects an operation needs, while pdfrw and pdfplumber parse the whole file on open.
+# benchmark_backends() and set_default_backends() tune the order for a given machine and files;
+# an order saved with set_default_backends(..., save=True) is loaded on first use in every process.
+DEFAULT_BACKENDS = {
+    "page_count": ("pdfium", "pdfrw", "pdfplumber"),
+    "page_sizes": ("pdfium", "pdfrw", "pdfplumber"),
+    "text": ("pdfium", "pdfplumber"),
+    "render": ("pdfium", "pdfplumber"),
+    "write": ("pdfrw",),  # Imposition: builds new pages from pdfrw's page objects
+}
+SAVED_BACKENDS_NAME = "pdf_backends.json"
+_default_backends = dict(DEFAULT_BACKENDS)
+_saved_backends_loaded = False
+_saved_backends_lock = threading.Lock()
+
+
+class PdfBackend:
+    """
+    A PDF engine. Subclasses implement the operations they list; a document is whatever open()
+    returns for the engine. Page indices are 0-based and page sizes are (width, height) in
+    points as displayed, i.e. with /Rotate applied.
+    """
+
+    name = None
+    module = None  # Package the engine needs
+    operations = frozenset()
+    lock = None    # Held while a document is open, for engines that are not thread-safe
+
+    def available(self):
+        return importlib.util.find_spec(self.module) is not None
+
+    @contextmanager
+    def opened(self, pdf_path):
+        with self.lock or nullcontext():
+            document = self.open(pdf_path)
+            try:
+                yield document
+            finally:
+                self.close(document)
+
+    def open(self, pdf_path):
+        raise NotImplementedError
+
+    def close(self, document):
+        pass
+
+    def page_count(self, document):
+        raise NotImplementedError
+
+    def page_sizes(self, document):
+        raise NotImplementedError
+
+    def page_text(self, document, index):
+        raise NotImplementedError
+
+    def render_page(self, document, index, scale=1.0):
+        """The page as a PIL image, scale pixels per point."""
+        raise NotImplementedError
+
+    def writer(self, output_path, **options):
+        raise NotImplementedError
+
+
+class PdfiumBackend(PdfBackend):
+    """pypdfium2 (PDFium): reads only the objects an operation needs, so it opens large PDFs instantly."""
+
+    name = "pdfium"
+    module = "pypdfium2"
+    operations = frozenset({"page_count", "page_sizes", "text", "render"})
+    lock = threading.RLock()  # PDFium must not be called from several threads at once
+
+    def open(self, pdf_path):
+        import pypdfium2
+        return pypdfium2.PdfDocument(pdf_path)
+
+    def close(self, document):
+        document.close()
+
+    def page_count(self, document):
+        return len(document)
+
+    def page_sizes(self, document):
+        # Sizes from the page tree, without loading the pages
+        return tuple(document.get_page_size(index) for index in range(len(document)))
+
+    def page_text(self, document, index):
+        page = document[index]
+        try:
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_bounded()
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+
+    def render_page(self, document, index, scale=1.0):
+        page = document[index]
+        try:
+            return page.render(scale=scale).to_pil()
+        finally:
+            page.close()
+
+
+class PdfrwBackend(PdfBackend):
+    """pdfrw: parses the whole file, but gives the page objects that imposition places on new pages."""
+
+    name = "pdfrw"
+    module = "pdfrw"
+    operations = frozenset({"page_count", "page_sizes", "write"})
+
+    def open(self, pdf_path):
+        # pdfrw parses the file as one str; decoding it from a memory map avoids also holding it as bytes
+        from pdfrw import PdfReader
+        from modules.os import map_file
+        with map_file(pdf_path) as data:
+            return PdfReader(fdata=str(data, "latin-1"))
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def page_sizes(self, document):
+        sizes = []
+        for page in document.pages:
+            x0, y0, x1, y1 = (float(value) for value in page.inheritable.MediaBox)
+            width, height = abs(x1 - x0), abs(y1 - y0)
+            if int(page.inheritable.Rotate or 0) % 180:
+                width, height = height, width
+            sizes.append((width, height))
+        return tuple(sizes)
+
+    def writer(self, output_path, **options):
+        """A StreamingPdfWriter for pages built from this backend's documents."""
+        from modules.pdf_writer import StreamingPdfWriter
+        return StreamingPdfWriter(output_path, **options)
+
+
+class PdfplumberBackend(PdfBackend):
+    """pdfplumber (pdfminer.six): slow to open, but its text follows the page layout."""
+
+    name = "pdfplumber"
+    module = "pdfplumber"
+    operations = frozenset({"page_count", "page_sizes", "text", "render"})
+
+    def open(self, pdf_path):
+        import pdfplumber
+        return pdfplumber.open(pdf_path)
+
+    def close(self, document):
+        document.close()
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def page_sizes(self, document):
+        return tuple((float(page.width), float(page.height)) for page in document.pages)
+
+    def page_text(self, document, index):
+        return document.pages[index].extract_text()
+
+    def render_page(self, document, index, scale=1.0):
+        return document.pages[index].to_image(resolution=72 * scale).original
+
+
+BACKENDS = {backend.name: backend for backend in (PdfiumBackend(), PdfrwBackend(), PdfplumberBackend())}
+
+
+def get_backend(operation, name=None):
+    """
+    The backend for operation (one of OPERATIONS): name if given, else the first available
+    one in the default order.
+
+    Raises:
+        ValueError: If the named backend does not support the operation, or none is available.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown PDF operation: {operation}. Expected one of {', '.join(OPERATIONS)}.")
+    if name is not None:
+        backend = BACKENDS.get(name)
+        if backend is None or operation not in backend.operations or not backend.available():
+            raise ValueError(f"PDF backend {name} cannot do {operation}.")
+        return backend
+    _load_saved_backends()
+    for candidate in _default_backends[operation]:
+        backend = BACKENDS[candidate]
+        if backend.available():
+            return backend
+    raise ValueError(f"No PDF backend is installed for {operation} (tried {', '.join(_default_backends[operation])}).")
+
+
+def page_count(pdf_path, backend=None):
+    """Number of pages of a PDF."""
+    backend = get_backend("page_count", backend)
+    with backend.opened(pdf_path) as document:
+        return backend.page_count(document)
+
+
+def page_sizes(pdf_path, backend=None):
+    """(width, height) in points of every page of a PDF, as displayed."""
+    backend = get_backend("page_sizes", backend)
+    with backend.opened(pdf_path) as document:
+        return backend.page_sizes(document)
+
+
+def page_text(pdf_path, pages=None, backend=None):
+    """Text of the given pages (0-based indices, default: all) of a PDF, one string per page."""
+    backend = get_backend("text", backend)
+    with backend.opened(pdf_path) as document:
+        pages = range(backend.page_count(document)) if pages is None else pages
+        return [backend.page_text(document, index) for index in pages]
+
+
+def render_page(pdf_path, index=0, scale=1.0, backend=None):
+    """A page of a PDF as a PIL image, scale pixels per point."""
+    backend = get_backend("render", backend)
+    with backend.opened(pdf_path) as document:
+        return backend.render_page(document, index, scale)
+
+
+def benchmark_backends(pdf_path, repeat=3, sample_pages=5):
+    """
+    Time each available backend on every operation that more than one of them supports, opening
+    pdf_path anew each run, after an untimed run that also imports the engine; text and render
+    use the first sample_pages pages.
+    Returns {operation: [(seconds, backend name), ...]} fastest first (best of repeat runs).
+    """
+    def sample(backend, document):
+        return range(min(sample_pages, backend.page_count(document)))
+
+    runs = {
+        "page_count": lambda backend, document: backend.page_count(document),
+        "page_sizes": lambda backend, document: backend.page_sizes(document),
+        "text": lambda backend, document: [backend.page_text(document, index)
+                                           for index in sample(backend, document)],
+        "render": lambda backend, document: [backend.render_page(document, index)
+                                             for index in sample(backend, document)],
+    }
+    results = {}
+    for operation, run in runs.items():
+        candidates = [backend for backend in BACKENDS.values()
+                      if operation in backend.operations and backend.available()]
+        if len(candidates) < 2:
+            continue
+        timings = []
+        for backend in candidates:
+            best = None
+            for attempt in range(repeat + 1):
+                start = time.perf_counter()
+                with backend.opened(pdf_path) as document:
+                    run(backend, document)
+                seconds = time.perf_counter() - start
+                if attempt:
+                    best = seconds if best is None else min(best, seconds)
+            timings.append((best, backend.name))
+        results[operation] = sorted(timings)
+        logger.info(f"PDF backends for {operation} on {pdf_path}: "
+                    + ", ".join(f"{name} {seconds * 1000:.1f} ms" for seconds, name in results[operation]))
+    return results
+
+
+def combine_benchmarks(results):
+    """Merge several benchmark_backends() results (e.g. one per sample file), adding up the times."""
+    totals = {}
+    for result in results:
+        for operation, timings in result.items():
+            for seconds, name in timings:
+                totals.setdefault(operation, {})[name] = totals.get(operation, {}).get(name, 0.0) + seconds
+    return {operation: sorted((seconds, name) for name, seconds in times.items())
+            for operation, times in totals.items()}
+
+
+def get_saved_backends_path():
+    """Where set_default_backends(..., save=True) keeps the order, in the user's config folder."""
+    from platformdirs import user_config_dir
+    from config.logging_config import APP_NAME, COMPANY_NAME
+    return os.path.join(user_config_dir(APP_NAME, COMPANY_NAME), SAVED_BACKENDS_NAME)
+
+
+def _apply_order(operation, names):
+    # Backends that were not timed (e.g. not installed then) stay as fallbacks, in the default order
+    names = [name for name in names if name in BACKENDS and operation in BACKENDS[name].operations]
+    _default_backends[operation] = tuple(names) + tuple(
+        name for name in DEFAULT_BACKENDS[operation] if name not in names)
+
+
+def set_default_backends(results, save=False):
+    """
+    Use the backends benchmark_backends() found fastest from now on in this process, and with
+    save=True also in later ones (see get_saved_backends_path()). Returns the new order.
+
+    Raises:
+        OSError: If save is set and the order cannot be written.
+    """
+    global _saved_backends_loaded
+    with _saved_backends_lock:
+        _saved_backends_loaded = True  # A saved order must not override this one later
+        for operation, timings in results.items():
+            if operation in DEFAULT_BACKENDS:
+                _apply_order(operation, [name for _, name in timings])
+        order = {operation: list(names) for operation, names in _default_backends.items()}
+        if save:
+            path = get_saved_backends_path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(order, f, indent=2)
+            logger.info(f"Saved PDF backend order to {path}.")
+    return order
+
+
+def reset_default_backends():
+    """Go back to DEFAULT_BACKENDS and delete the saved order, if any. Returns True if one was deleted."""
+    global _saved_backends_loaded
+    with _saved_backends_lock:
+        _saved_backends_loaded = True
+        _default_backends.update(DEFAULT_BACKENDS)
+        try:
+            os.remove(get_saved_backends_path())
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def _load_saved_backends():
+    # Once per process; an unreadable file is logged and the built-in order is kept
+    global _saved_backends_loaded
+    if _saved_backends_loaded:
+        return
+    with _saved_backends_lock:
+        if _saved_backends_loaded:
+            return
+        _saved_backends_loaded = True
+        try:
+            path = get_saved_backends_path()
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            for operation, names in saved.items():
+                if operation in DEFAULT_BACKENDS and isinstance(names, list):
+                    _apply_order(operation, names)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.warning(f"Ignoring the saved PDF backend order: {e}")
@@ -0,0 +1,161 @@
+import math
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from pdfrw import PdfArray, PdfDict, PdfName
+from pdfrw.buildxobj import pagexobj
+
+SHEET_SIZES = {  # Portrait width and height in points; the first is the default
+    "A4": (595, 842),
+    "A3": (842, 1191),
+    "A5": (420, 595),
+    "Letter": (612, 792),
+    "Legal": (612, 1008),
+    "Tabloid": (792, 1224),
+}
+ORIENTATIONS = ("landscape", "portrait")
+ORDERS = ("grid", "booklet")  # booklet: 2-up, in saddle-stitch order for duplex printing
+
+
+def get_grid(pages_per_sheet, orientation="landscape"):
+    """
+    (columns, rows) with room for pages_per_sheet pages, as square as possible: wider than tall
+    on landscape sheets (e.g. 3 x 2 for 6-up), taller than wide on portrait ones.
+    """
+    short = max(1, math.isqrt(pages_per_sheet))
+    long = -(-pages_per_sheet // short)
+    return (long, short) if orientation == "landscape" else (short, long)
+
+
+def parse_grid(text):
+    """(columns, rows) from text such as '3x2'."""
+    match = re.fullmatch(r"\s*(\d+)\s*[xX*]\s*(\d+)\s*", text)
+    if not match or not all(int(value) for value in match.groups()):
+        raise ValueError(f"Invalid grid: {text!r}. Expected columns x rows, e.g. 3x2.")
+    return int(match.group(1)), int(match.group(2))
+
+
+def _number(value):
+    return ("%.4f" % value).rstrip("0").rstrip(".")
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    """
+    How source pages are put on sheets: sheet_size is a SHEET_SIZES name or (width, height) in
+    points, grid is (columns, rows) and defaults to get_grid(), margin is kept around each page
+    (in points) and order is one of ORDERS. Pages are scaled to fit their cell without cropping
+    and centered in it.
+    """
+
+    pages_per_sheet: int = 4
+    sheet_size: object = "A4"
+    orientation: str = "landscape"
+    grid: tuple = None
+    margin: float = 5
+    order: str = "grid"
+
+    def __post_init__(self):
+        if self.pages_per_sheet < 1:
+            raise ValueError("Pages per sheet must be at least 1.")
+        if isinstance(self.sheet_size, str) and self.sheet_size not in SHEET_SIZES:
+            raise ValueError(f"Unknown sheet size: {self.sheet_size}. Expected one of {', '.join(SHEET_SIZES)}.")
+        if self.orientation not in ORIENTATIONS:
+            raise ValueError(f"Unknown orientation: {self.orientation}. Expected one of {', '.join(ORIENTATIONS)}.")
+        if self.order not in ORDERS:
+            raise ValueError(f"Unknown page order: {self.order}. Expected one of {', '.join(ORDERS)}.")
+        if self.order == "booklet" and self.pages_per_sheet != 2:
+            raise ValueError("Booklets have 2 pages per sheet.")
+        columns, rows = self.columns_rows
+        if columns * rows < self.pages_per_sheet:
+            raise ValueError(f"A {columns}x{rows} grid has no room for {self.pages_per_sheet} pages per sheet.")
+        width, height = self.size
+        if min(width / columns, height / rows) <= 2 * self.margin:
+            raise ValueError(f"A margin of {self.margin} points leaves no room for the pages.")
+
+    @property
+    def size(self):
+        """(width, height) of a sheet in points."""
+        width, height = SHEET_SIZES[self.sheet_size] if isinstance(self.sheet_size, str) else self.sheet_size
+        width, height = sorted((width, height))
+        return (height, width) if self.orientation == "landscape" else (width, height)
+
+    @property
+    def columns_rows(self):
+        return tuple(self.grid) if self.grid else get_grid(self.pages_per_sheet, self.orientation)
+
+    @cached_property
+    def cells(self):
+        """(x, y, width, height) of the area each page is fitted into, in placement order."""
+        width, height = self.size
+        columns, rows = self.columns_rows
+        cell_width, cell_height = width / columns, height / rows
+        return [(column * cell_width + self.margin, height - (row + 1) * cell_height + self.margin,
+                 cell_width - 2 * self.margin, cell_height - 2 * self.margin)
+                for row in range(rows) for column in range(columns)][:self.pages_per_sheet]
+
+    def sheet_count(self, page_count):
+        if self.order == "booklet":
+            return -(-page_count // 4) * 2
+        return -(-page_count // self.pages_per_sheet)
+
+    def sheets(self, page_count):
+        """
+        Page indices placed on each sheet, cell by cell; None leaves a cell blank. Booklet sheets
+        alternate front and back sides, padded with blank pages to a multiple of 4.
+        """
+        if self.order == "booklet":
+            last = -(-page_count // 4) * 4 - 1
+            sheets = []
+            for index in range(0, (last + 1) // 2, 2):
+                sheets.append((last - index, index))          # Front: outer half, inner half
+                sheets.append((index + 1, last - index - 1))  # Back
+            return [tuple(page if page < page_count else None for page in sheet) for sheet in sheets]
+        return [tuple(range(start, min(start + self.pages_per_sheet, page_count)))
+                for start in range(0, page_count, self.pages_per_sheet)]
+
+
+class SheetBuilder:
+    """
+    Build sheet pages from source pages with a SheetLayout. Each source page is placed as a
+    Form XObject with a single transformation; the scale and offset within a cell are computed
+    once for each distinct page geometry (box and rotation) and reused for every page that has it.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.size = layout.size
+        self._placements = {}  # (x, y, width, height) of a page's Form XObject -> (scale, dx, dy)
+
+    def placement(self, xobj):
+        """(scale, dx, dy): draw xobj at cell (x, y) with the matrix scale 0 0 scale x+dx y+dy."""
+        key = (xobj.x, xobj.y, xobj.w, xobj.h)
+        placement = self._placements.get(key)
+        if placement is None:
+            x, y, width, height = key
+            _, _, cell_width, cell_height = self.layout.cells[0]
+            scale = min(cell_width / width, cell_height / height)  # Preserve aspect ratio
+            placement = self._placements[key] = (scale, (cell_width - width * scale) / 2 - x * scale,
+                                                 (cell_height - height * scale) / 2 - y * scale)
+        return placement
+
+    def build(self, pages):
+        """A new sheet page holding pages (source pages, or None for a blank cell) cell by cell."""
+        xobjects = PdfDict()
+        content = []
+        for index, (page, cell) in enumerate(zip(pages, self.layout.cells)):
+            if page is None:
+                continue
+            # pdfrw caches the Form XObject on the page's contents, with its rotation applied
+            xobj = pagexobj(page)
+            scale, dx, dy = self.placement(xobj)
+            name = PdfName("Page%d" % index)
+            xobjects[name] = xobj
+            content.append("q %s 0 0 %s %s %s cm %s Do Q" % (_number(scale), _number(scale), _number(cell[0] + dx),
+                                                             _number(cell[1] + dy), name))
+        return PdfDict(
+            Type=PdfName.Page,
+            MediaBox=PdfArray([0, 0, *self.size]),
+            Resources=PdfDict(XObject=xobjects),
+            Contents=PdfDict(indirect=True, stream="\n".join(content)),
+        )
@@ -0,0 +1,475 @@
+import hashlib
+import os
+import pickle
+import time
+import zlib
+from dataclasses import dataclass
+import pdfrw
+from pdfrw import PdfArray, PdfDict, PdfName, PdfObject
+from pdfrw.objects import PdfIndirect
+from pdfrw.pdfwriter import user_fmt
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CATALOG_REF = PdfObject("1 0 R")
+PAGES_REF = PdfObject("2 0 R")
+FIRST_OBJECT = 3  # 1 and 2 are the catalog and the page tree, written last
+ITEMS_PER_LINE = 8  # Arrays and dicts are broken into lines of this many items
+OBJECTS_PER_STREAM = 100  # Objects packed into each object stream
+
+# Streaming relies on pdfrw internals, so it is only used with the pdfrw version it was checked against;
+# create_dynamic_pages_per_sheet falls back to pdfrw's own PdfWriter with any other. The internals are
+# all accessed in _source_key and _release:
+#   PdfDict.indirect                   for a loaded object, its (number, generation) key, whose .value is the object
+#   PdfDict._stream                    a stream's data (behind the .stream property)
+#   PdfReader.indirect_objects         loaded objects by key; findindirect(number, generation) makes an unloaded one
+#   PdfArray._resolve / ._resolver     an array loads its PdfIndirect items on first access, then makes _resolve a no-op
+#   PdfArray.xobj_copy                 pagexobj()'s cached Form XObject of a page's content array
+PDFRW_STREAMING_VERSION = "0.4"
+STREAMING_SUPPORTED = pdfrw.__version__ == PDFRW_STREAMING_VERSION
+
+
+def _source_key(obj):
+    """
+    (object number, generation) of an object as loaded from a source PDF by pdfrw, else None.
+    pdfrw copies this key onto copies of a loaded dict (e.g. the Form XObjects it builds from page
+    content), so only the object the reader actually loaded for the key counts.
+    """
+    if isinstance(obj, PdfIndirect):
+        return tuple(obj)
+    key = getattr(obj, "indirect", None)
+    if isinstance(key, tuple) and getattr(key, "value", obj) is obj:
+        return tuple(key)
+    return None
+
+
+def _join(items, template):
+    """items formatted as parts (see render), separated by spaces and broken into lines."""
+    parts = []
+    for index, item in enumerate(items):
+        if index:
+            parts.append("\n" if index % ITEMS_PER_LINE == 0 else " ")
+        parts.extend(item)
+    opening, closing = template.split("%s")
+    return [opening, *parts, closing]
+
+
+def render(parts, numbers=None):
+    """
+    Text of an object formatted as parts: strings, and object numbers (ints) that are written
+    as references, optionally renumbered through the numbers mapping.
+    """
+    return "".join(part if isinstance(part, str) else "%d 0 R" % (numbers[part] if numbers else part)
+                   for part in parts)
+
+
+def _megabytes(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+@dataclass
+class WriteStats:
+    """What a StreamingPdfWriter wrote, and what its optimizations saved."""
+
+    size: int = 0                 # Bytes written
+    seconds: float = 0.0
+    duplicates: int = 0           # Objects not written because an identical one already was
+    duplicate_bytes: int = 0
+    compressed_streams: int = 0
+    compression_saved: int = 0    # Bytes saved by compressing streams
+    packed_objects: int = 0       # Objects written into object streams
+
+    def add(self, other):
+        """Count what another writer (e.g. for a fragment) saved, too."""
+        self.duplicates += other.duplicates
+        self.duplicate_bytes += other.duplicate_bytes
+        self.compressed_streams += other.compressed_streams
+        self.compression_saved += other.compression_saved
+
+    def describe(self):
+        text = f"{_megabytes(self.size)} in {self.seconds:.2f} s"
+        if self.duplicates:
+            text += f", {self.duplicates} duplicate objects shared (saved {_megabytes(self.duplicate_bytes)})"
+        if self.compressed_streams:
+            text += f", {self.compressed_streams} streams compressed (saved {_megabytes(self.compression_saved)})"
+        if self.packed_objects:
+            text += f", {self.packed_objects} objects packed into object streams"
+        return text
+
+
+class StreamingPdfWriter:
+    """
+    Write a PDF page by page. Each page passed to addpage() is written with every object it
+    references right away, so memory does not grow with the number of pages; only the
+    cross-reference offsets are kept until close().
+
+    Objects loaded from a source PDF by pdfrw are written once and referenced by number from
+    then on, even after their Python objects were released (see unload_page), so fonts and
+    images shared by several pages stay shared. Their stream data is dropped once written.
+    source names the PDF a page was read from when pages of several PDFs are written.
+    Objects created for a page (e.g. by PageMerge) are shared within that page only.
+
+    Output options:
+        compress: Flate-compress streams that have no filter yet, such as page content.
+        deduplicate: Write identical objects (e.g. the same font or image embedded in several
+            source pages) once. Objects are compared by a hash of their content and of the
+            objects they reference.
+        object_streams: Pack objects other than streams into compressed object streams, with a
+            cross-reference stream (PDF 1.5). These objects are kept in memory until close().
+
+    Sheets built in other processes by PdfFragmentWriter are added with add_fragment(); the
+    result is the same file that adding their pages here would have written.
+    stats (a WriteStats) tells what was written and saved.
+    """
+
+    def __init__(self, output_path, version="1.3", compress=False, deduplicate=False, object_streams=False):
+        self.file = open(output_path, "wb")
+        self.compress = compress
+        self.deduplicate = deduplicate
+        self.object_streams = object_streams
+        # File offset of object n at index n - 1, or (object stream number, index) if it was packed
+        self.offsets = [None] * (FIRST_OBJECT - 1)
+        self.page_refs = []
+        self.stats = WriteStats()
+        self._source_refs = {}  # (source, object number, generation) -> object number in this file
+        self._hashes = {}       # Content hash -> number of the object written with it
+        self._digests = {}      # Object number -> its content hash
+        self._open = {}         # Objects being formatted -> number given to them early (see _cycle)
+        self._packed = []       # (object number, text) of objects for the object streams
+        self._written_sources = []
+        self._started = time.perf_counter()
+        self._position = 0
+        self._write_header("1.5" if object_streams and version < "1.5" else version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def _write_header(self, version):
+        self._write("%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n" % version)
+
+    def _write(self, text):
+        data = text.encode("latin-1")
+        self.file.write(data)
+        self._position += len(data)
+
+    def _write_stream(self, data):
+        self._write("\nstream\n")
+        self.file.write(data)
+        self._position += len(data)
+        self._write("\nendstream")
+
+    def _put(self, objnum, text, data):
+        """Write object objnum: its text and, for a stream, its data (bytes, else None)."""
+        if self.object_streams and data is None:
+            self._packed.append((objnum, text))
+            return
+        self.offsets[objnum - 1] = self._position
+        self._write("%d 0 obj\n%s" % (objnum, text))
+        if data is not None:
+            self._write_stream(data)
+        self._write("\nendobj\n")
+
+    def _emit(self, objnum, key, parts, data, digest):
+        self._put(objnum, render(parts), data)
+
+    def addpage(self, page, source=None):
+        inheritable = page.inheritable
+        page = PdfDict(page, Resources=inheritable.Resources, MediaBox=inheritable.MediaBox,
+                       CropBox=inheritable.CropBox, Rotate=inheritable.Rotate)
+        page.indirect = True
+        page.Parent = PAGES_REF
+        self.page_refs.append(self._write_object(page, None, source, {}, unique=True))
+
+        # Later pages refer to these by number, so their data is no longer needed
+        for obj in self._written_sources:
+            _release(obj)
+        self._written_sources = []
+        return self
+
+    def _allocate(self):
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def _write_object(self, obj, key, source, new_refs, unique=False):
+        """
+        Write obj after the objects it references and return its number. With deduplicate, an
+        object identical to one written before is not written again (unless unique, e.g. a page);
+        the number of that one is returned instead.
+        """
+        marker = key if key is not None else id(obj)
+        self._open[marker] = None
+        if self.compress and isinstance(obj, PdfDict) and obj.stream is not None \
+                and dict.get(obj, PdfName.Filter) is None:
+            self._compress(obj)
+        parts = self._format_body(obj, source, new_refs)
+        stream = obj.stream if isinstance(obj, PdfDict) else None
+        data = stream.encode("latin-1") if stream is not None else None
+        objnum = self._open.pop(marker)
+
+        digest = None
+        if self.deduplicate and objnum is None and not unique:
+            digest = self._digest(parts, data)
+            existing = self._hashes.get(digest)
+            if existing is not None:
+                self.stats.duplicates += 1
+                self.stats.duplicate_bytes += len(data or b"") + sum(len(part) for part in parts
+                                                                     if isinstance(part, str))
+                return existing
+        if objnum is None:
+            objnum = self._allocate()
+        if digest is not None:
+            self._hashes[digest] = objnum
+            self._digests[objnum] = digest
+        self._emit(objnum, key, parts, data, digest)
+        return objnum
+
+    def _cycle(self, marker):
+        # An object referenced while it is being formatted is numbered right away; it is then
+        # written as is, since its content hash would depend on itself
+        if self._open[marker] is None:
+            self._open[marker] = self._allocate()
+        return self._open[marker]
+
+    def _digest(self, parts, data):
+        """Hash of an object's content and of the objects it references, or None if one has none."""
+        children = []
+        for part in parts:
+            if not isinstance(part, str):
+                child = self._digests.get(part)
+                if child is None:
+                    return None
+                children.append(child)
+        text = "".join(part.replace("\0", "\0\0") if isinstance(part, str) else "\0R" for part in parts)
+        hasher = hashlib.blake2b(text.encode("latin-1"), digest_size=20)
+        hasher.update(b"".join(children))
+        if data is not None:
+            hasher.update(b"\0stream")
+            hasher.update(data)
+        return hasher.digest()
+
+    def _compress(self, obj):
+        data = obj.stream.encode("latin-1")
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            obj.stream = compressed.decode("latin-1")
+            obj.Filter = PdfName.FlateDecode
+            obj.DecodeParms = None
+            self.stats.compressed_streams += 1
+            self.stats.compression_saved += len(data) - len(compressed)
+
+    def _reference(self, obj, source, new_refs):
+        key = _source_key(obj)
+        if key is not None:
+            key = (source, *key)
+            objnum = self._source_refs.get(key)
+            if objnum is None:
+                if key in self._open:
+                    return [self._cycle(key)]
+                if isinstance(obj, PdfIndirect):
+                    obj = obj.real_value()
+                    if obj is None:
+                        return ["null"]
+                objnum = self._source_refs[key] = self._write_object(obj, key, source, new_refs)
+                if isinstance(obj, PdfDict) and obj.stream is not None:
+                    self._written_sources.append(obj)
+            return [objnum]
+        if id(obj) in self._open:
+            return [self._cycle(id(obj))]
+        objnum = new_refs.get(id(obj))
+        if objnum is None:
+            objnum = new_refs[id(obj)] = self._write_object(obj, None, source, new_refs)
+        return [objnum]
+
+    def _format_value(self, obj, source, new_refs):
+        if obj is None:
+            return ["null"]
+        if isinstance(obj, PdfIndirect):
+            return self._reference(obj, source, new_refs)
+        if isinstance(obj, PdfDict):
+            indirect = obj.indirect or obj.stream is not None
+        else:
+            indirect = getattr(obj, "indirect", False)
+        if indirect:
+            return self._reference(obj, source, new_refs)
+        return self._format_body(obj, source, new_refs)
+
+    def _format_body(self, obj, source, new_refs):
+        # Raw dict and list access, so objects that were already written are never loaded again
+        if isinstance(obj, dict):
+            items = []
+            for key, value in sorted((getattr(key, "encoded", None) or key, value) for key, value in dict.items(obj)):
+                items.append([key, " ", *self._format_value(value, source, new_refs)])
+            return _join(items, "<<%s>>")  # A stream, if any, is written after this by the caller
+        if isinstance(obj, (list, tuple)):
+            values = list.__iter__(obj) if isinstance(obj, list) else iter(obj)
+            return _join([self._format_value(value, source, new_refs) for value in values], "[%s]")
+        if hasattr(obj, "indirect"):
+            return [str(getattr(obj, "encoded", None) or obj)]
+        return [user_fmt(obj)]
+
+    def add_fragment(self, fragment):
+        """
+        Append the pages of a fragment written by PdfFragmentWriter. Source objects this file
+        already has, and objects identical to ones it has, are referenced instead of being
+        written again.
+        """
+        path, entries, page_numbers, stats = fragment
+        numbers, skipped, duplicates = {}, set(), set()
+        # Number the objects in the order the fragment did, as writing its pages here would have
+        for objnum, key, digest in sorted(entries):
+            existing = self._source_refs.get(key) if key is not None else None
+            if existing is None and digest is not None:
+                existing = self._hashes.get(digest)
+                if existing is not None:
+                    duplicates.add(objnum)
+            if existing is None:
+                existing = self._allocate()
+                if digest is not None:
+                    self._hashes[digest] = existing
+                    self._digests[existing] = digest
+            else:
+                skipped.add(objnum)
+            numbers[objnum] = existing
+            if key is not None:
+                self._source_refs[key] = existing
+        self.stats.add(stats)
+
+        with open(path, "rb") as file:
+            for objnum, key, digest in entries:
+                parts, stream_size = pickle.load(file)
+                if objnum in skipped:
+                    file.seek(max(stream_size, 0), os.SEEK_CUR)
+                    if objnum in duplicates:
+                        self.stats.duplicates += 1
+                        self.stats.duplicate_bytes += max(stream_size, 0) + sum(len(part) for part in parts
+                                                                                if isinstance(part, str))
+                    continue
+                self._put(numbers[objnum], render(parts, numbers), file.read(stream_size) if stream_size >= 0 else None)
+        self.page_refs.extend(numbers[objnum] for objnum in page_numbers)
+
+    def _write_object_streams(self):
+        packed, self._packed = self._packed, []
+        self.stats.packed_objects += len(packed)
+        for start in range(0, len(packed), OBJECTS_PER_STREAM):
+            stream_number = self._allocate()
+            header, texts, offset = [], [], 0
+            for index, (objnum, text) in enumerate(packed[start:start + OBJECTS_PER_STREAM]):
+                self.offsets[objnum - 1] = (stream_number, index)
+                header.append("%d %d" % (objnum, offset))
+                texts.append(text)
+                offset += len(text) + 1
+            header = " ".join(header) + "\n"
+            data = zlib.compress((header + "\n".join(texts)).encode("latin-1"))
+            self._put(stream_number, "<</Filter /FlateDecode /First %d /Length %d /N %d /Type /ObjStm>>"
+                      % (len(header), len(data), len(texts)), data)
+
+    def _write_xref_table(self):
+        xref_position = self._position
+        lines = ["xref\n0 %d\n" % (len(self.offsets) + 1), "0000000000 65535 f\r\n"]
+        lines.extend("%010d 00000 n\r\n" % offset for offset in self.offsets)
+        self._write("".join(lines))
+        self._write("trailer\n<</Root %s /Size %d>>\nstartxref\n%d\n%%%%EOF\n"
+                    % (CATALOG_REF, len(self.offsets) + 1, xref_position))
+
+    def _write_xref_stream(self):
+        objnum = self._allocate()
+        xref_position = self.offsets[objnum - 1] = self._position
+        width = max(1, (max(xref_position, objnum).bit_length() + 7) // 8)
+        rows = [b"\0" + bytes(width) + b"\xff\xff"]
+        for offset in self.offsets:
+            if isinstance(offset, tuple):
+                rows.append(b"\2" + offset[0].to_bytes(width, "big") + offset[1].to_bytes(2, "big"))
+            else:
+                rows.append(b"\1" + offset.to_bytes(width, "big") + b"\0\0")
+        data = zlib.compress(b"".join(rows))
+        self._write("%d 0 obj\n<</Filter /FlateDecode /Length %d /Root %s /Size %d /Type /XRef /W [1 %d 2]>>"
+                    % (objnum, len(data), CATALOG_REF, len(self.offsets), width))
+        self._write_stream(data)
+        self._write("\nendobj\nstartxref\n%d\n%%%%EOF\n" % xref_position)
+
+    def close(self):
+        """Write the page tree, catalog and cross-reference table, and close the file."""
+        self._put(2, "<</Count %d /Kids %s /Type /Pages>>"
+                  % (len(self.page_refs), render(_join([[objnum] for objnum in self.page_refs], "[%s]"))), None)
+        self._put(1, "<</Pages %s /Type /Catalog>>" % PAGES_REF, None)
+        if self.object_streams:
+            self._write_object_streams()
+            self._write_xref_stream()
+        else:
+            self._write_xref_table()
+        self.file.close()
+        self.stats.size = self._position
+        self.stats.seconds = time.perf_counter() - self._started
+
+
+class PdfFragmentWriter(StreamingPdfWriter):
+    """
+    Write pages like StreamingPdfWriter, but as a fragment to be appended to a PDF being written
+    elsewhere (StreamingPdfWriter.add_fragment), e.g. sheets built by a worker process.
+    Objects are stored formatted with their own numbering (stream data as raw bytes), along with
+    the source object each one came from and its content hash, so the final writer can renumber
+    them and skip the ones it already has. compress and deduplicate should match the final writer.
+    After close(), fragment is the picklable (path, entries, page object numbers, stats).
+    """
+
+    def __init__(self, fragment_path, compress=False, deduplicate=False):
+        super().__init__(fragment_path, compress=compress, deduplicate=deduplicate)
+        self._entries = []  # (object number, source key, content hash) in the order written
+        self.fragment = None
+
+    def _write_header(self, version):
+        pass
+
+    def _emit(self, objnum, key, parts, data, digest):
+        self._entries.append((objnum, key, digest))
+        pickle.dump((parts, len(data) if data is not None else -1), self.file, pickle.HIGHEST_PROTOCOL)
+        if data is not None:
+            self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        self.stats.seconds = time.perf_counter() - self._started
+        self.fragment = (self.file.name, self._entries, self.page_refs, self.stats)
+
+
+def _release(obj, reader=None):
+    """
+    Let pdfrw free what it holds for a source object (see STREAMING_SUPPORTED for the internals used),
+    and return what to keep in its place:
+    - without reader, a stream that was written: its data is dropped and the dict itself returned;
+    - with reader, an object loaded by it: a reference that is not loaded yet;
+    - with reader, a page's content array: its items are released in place, and the array will
+      load them again (and pagexobj rebuild its Form XObject) if it is used again.
+    """
+    if reader is None:
+        obj._stream = None
+        return obj
+    if isinstance(obj, PdfArray) and _source_key(obj) is None:
+        for index, item in enumerate(list.__iter__(obj)):
+            list.__setitem__(obj, index, _release(item, reader))
+        obj._resolve = obj._resolver
+        vars(obj).pop("xobj_copy", None)
+        return obj
+    key = _source_key(obj)
+    if key is None or isinstance(obj, PdfIndirect):
+        return obj
+    reader.indirect_objects.pop(key, None)
+    return reader.findindirect(*key)
+
+
+def unload_page(reader, page):
+    """
+    Let the content of a source page be freed once it was placed and written. Its content
+    streams, and pdfrw's cached Form XObject copies of them, are swapped for references that
+    are not loaded yet; if the page is used again, its content is read from the source anew.
+    """
+    contents = dict.get(page, PdfName.Contents)
+    if contents is not None:
+        dict.__setitem__(page, PdfName.Contents, _release(contents, reader))
@@ -1,4 +1,23 @@
-from cryptography.fernet import Fernet
+import base64
+import hashlib
+import hmac
+import binascii
+import json
+import os
+import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidSignature, InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.hmac import HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 
 def encrypt_message(message, key):
     cipher_suite = Fernet(key)
@@ -10,40 +29,560 @@ def decrypt_message(encrypted_message, key):
     decrypted_message = cipher_suite.decrypt(encrypted_message.encode())
     return decrypted_message.decode('utf-8')
 
+# Passphrase keys: anything that is not a Fernet key is treated as a passphrase and stretched
+# with scrypt (default) or PBKDF2. The salt and parameters travel in a small header in front of
+# the encrypted file (or value), so decryption only needs the passphrase:
+#   magic "CRYPTKD" | version (1) | kdf (1) | salt (16) | scrypt n or PBKDF2 iterations (4) | r (1) | p (1)
+KDF_MAGIC = b"CRYPTKD"
+KDF_VERSION = 1
+KDF_SCRYPT = 1
+KDF_PBKDF2 = 2
+SCRYPT_PARAMS = (2 ** 15, 8, 1)  # n, r, p
+PBKDF2_ITERATIONS = 600_000
+KDF_VALUE_PREFIX = "$cryptkd$"
+DERIVED_KEY_TTL = 15 * 60  # Seconds a derived key (and the session salt) stays cached
+_KDF_HEADER = struct.Struct(">7sBB16sIBB")
+KDF_HEADER_SIZE = _KDF_HEADER.size
+# Upper bounds for parameters read from a header, so a crafted file cannot demand hours of work
+_MAX_SCRYPT_N, _MAX_SCRYPT_R, _MAX_SCRYPT_P = 2 ** 20, 32, 16
+_MAX_PBKDF2_ITERATIONS = 10_000_000
+
+def is_fernet_key(key):
+    """True if key is a urlsafe base64-encoded 32-byte Fernet key."""
+    try:
+        return len(base64.urlsafe_b64decode(key)) == 32
+    except (binascii.Error, ValueError, TypeError):
+        return False
+
+def _derive(passphrase, salt, kdf, params):
+    if kdf == KDF_SCRYPT:
+        n, r, p = params
+        derived = Scrypt(salt=salt, length=32, n=n, r=r, p=p).derive(passphrase.encode('utf-8'))
+    else:
+        derived = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt,
+                             iterations=params[0]).derive(passphrase.encode('utf-8'))
+    return base64.urlsafe_b64encode(derived)
+
+class DerivedKeyCache:
+    """
+    Process-wide cache of passphrase-derived Fernet keys, keyed by (passphrase hash, salt, KDF params).
+    Entries expire after ttl seconds; wipe() forgets everything at once. The passphrase itself is not
+    kept; it is identified by an HMAC under a random per-process secret.
+    """
+
+    def __init__(self, ttl=DERIVED_KEY_TTL):
+        self.ttl = ttl
+        self.derivations = 0  # Number of KDF runs, for logging and benchmarks
+        self._secret = os.urandom(32)
+        self._keys = {}       # (passphrase id, salt, kdf, params) -> (bytearray key, expiry)
+        self._salts = {}      # (passphrase id, kdf) -> (salt, expiry)
+        self._lock = threading.Lock()
+
+    def _passphrase_id(self, passphrase):
+        return hmac.new(self._secret, passphrase.encode('utf-8'), hashlib.sha256).digest()
+
+    def _purge(self, now):
+        for cache in (self._keys, self._salts):
+            for entry in [entry for entry, (_, expiry) in cache.items() if expiry <= now]:
+                value, _ = cache.pop(entry)
+                if isinstance(value, bytearray):
+                    value[:] = bytes(len(value))
+
+    def get(self, passphrase, salt, kdf, params):
+        """Return the derived key, running the KDF only on a cache miss."""
+        entry = (self._passphrase_id(passphrase), salt, kdf, params)
+        with self._lock:  # Held while deriving, so concurrent callers do not all run the KDF
+            now = time.monotonic()
+            self._purge(now)
+            if entry not in self._keys:
+                self._keys[entry] = (bytearray(_derive(passphrase, salt, kdf, params)), now + self.ttl)
+                self.derivations += 1
+            return bytes(self._keys[entry][0])
+
+    def session_salt(self, passphrase, kdf):
+        """Salt reused for everything encrypted with this passphrase while it is cached."""
+        entry = (self._passphrase_id(passphrase), kdf)
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            if entry not in self._salts:
+                self._salts[entry] = (os.urandom(16), now + self.ttl)
+            return self._salts[entry][0]
+
+    def wipe(self):
+        """Overwrite and drop all cached keys and salts."""
+        with self._lock:
+            self._purge(float("inf"))
+
+derived_keys = DerivedKeyCache()
+
+def wipe_derived_keys():
+    derived_keys.wipe()
+
+def key_fingerprint(key, context):
+    """
+    Hex fingerprint of a key (Fernet key or passphrase) for recognizing it later without storing it:
+    an HMAC of context under the key. Passphrases are stretched with scrypt first, so guessing one
+    from its fingerprint is as slow as from a file encrypted with it.
+    """
+    if is_fernet_key(key):
+        secret = key.encode('utf-8') if isinstance(key, str) else key
+    else:
+        secret = _derive(key, hashlib.sha256(context.encode('utf-8')).digest()[:16], KDF_SCRYPT, SCRYPT_PARAMS)
+    return hmac.new(secret, context.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def passphrase_key(passphrase, kdf=None):
+    """Return (Fernet key, KDF header) for encrypting with a passphrase, using the session salt."""
+    kdf = kdf or KDF_SCRYPT
+    params = SCRYPT_PARAMS if kdf == KDF_SCRYPT else (PBKDF2_ITERATIONS, 0, 0)
+    salt = derived_keys.session_salt(passphrase, kdf)
+    header = _KDF_HEADER.pack(KDF_MAGIC, KDF_VERSION, kdf, salt, *params)
+    return derived_keys.get(passphrase, salt, kdf, params), header
+
+def is_passphrase_encrypted(head):
+    """True if the given leading bytes start with a KDF header."""
+    return head[:len(KDF_MAGIC)] == KDF_MAGIC
+
+def key_from_header(passphrase, header):
+    """Derive the Fernet key for data that starts with the given KDF header."""
+    if len(header) < KDF_HEADER_SIZE or not is_passphrase_encrypted(header):
+        raise ValueError("Missing passphrase header.")
+    _, version, kdf, salt, n, r, p = _KDF_HEADER.unpack(header[:KDF_HEADER_SIZE])
+    if version != KDF_VERSION:
+        raise ValueError(f"Unsupported passphrase header version: {version}")
+    if kdf == KDF_SCRYPT and 1 < n <= _MAX_SCRYPT_N and 0 < r <= _MAX_SCRYPT_R and 0 < p <= _MAX_SCRYPT_P:
+        params = (n, r, p)
+    elif kdf == KDF_PBKDF2 and 0 < n <= _MAX_PBKDF2_ITERATIONS:
+        params = (n, 0, 0)
+    else:
+        raise ValueError("Invalid key derivation parameters in header.")
+    return derived_keys.get(passphrase, salt, kdf, params)
+
+# Fernet tokens built straight from bytes-like objects (bytes, memoryview, mmap).
+# Fernet.encrypt only takes bytes, so large files would be copied (and, via str, decoded);
+# here the token is produced slice by slice and written to a binary file object instead.
+# Token layout: version 0x80 | timestamp (8) | IV (16) | AES-128-CBC ciphertext | HMAC-SHA256 (32)
+FERNET_VERSION = b"\x80"
+BUFFER_CHUNK_SIZE = 1024 * 1024  # Multiple of the AES block size and of 3 (base64)
+_FERNET_HEADER_SIZE = 25
+_FERNET_MAC_SIZE = 32
+
+def _fernet_keys(key):
+    Fernet(key)  # Validates the key with Fernet's error message
+    raw_key = base64.urlsafe_b64decode(key)
+    return raw_key[:16], raw_key[16:]  # Signing key, encryption key
+
+class _Base64Writer:
+    # Base64-encodes a stream of writes without holding the whole token in memory
+    def __init__(self, dst):
+        self.dst = dst
+        self.carry = b""
+
+    def write(self, data):
+        data = self.carry + bytes(data)
+        cut = len(data) - len(data) % 3
+        self.dst.write(base64.urlsafe_b64encode(data[:cut]))
+        self.carry = data[cut:]
+
+    def close(self):
+        self.dst.write(base64.urlsafe_b64encode(self.carry))
+
+def _raw_token_chunks(data, chunk_size):
+    """
+    Return (length, chunks) for a raw or base64 Fernet token held in a bytes-like object.
+    chunks() yields the raw token bytes in order; base64 is decoded a chunk at a time.
+    """
+    view = memoryview(data)
+    if view[:1] == FERNET_VERSION:
+        return len(view), lambda: (view[start:start + chunk_size] for start in range(0, len(view), chunk_size))
+
+    end = len(view)
+    while end and view[end - 1] in b" \t\r\n":
+        end -= 1
+    if end % 4:
+        raise InvalidToken
+    length = end // 4 * 3 - bytes(view[max(end - 2, 0):end]).count(b"=")
+    step = chunk_size - chunk_size % 4  # Whole base64 quanta per chunk
+
+    def chunks():
+        for start in range(0, end, step):
+            try:
+                yield base64.urlsafe_b64decode(view[start:min(start + step, end)].tobytes())
+            except binascii.Error:
+                raise InvalidToken
+    return length, chunks
+
+def _slice_chunks(chunks, begin, stop):
+    # Parts of a chunk sequence that fall within [begin, stop) of the joined bytes
+    offset = 0
+    for chunk in chunks:
+        low, high = max(begin - offset, 0), min(stop - offset, len(chunk))
+        if low < high:
+            yield chunk[low:high]
+        offset += len(chunk)
+
+def encrypt_buffer(data, key, dst, raw=False, chunk_size=BUFFER_CHUNK_SIZE):
+    """
+    Fernet-encrypt a bytes-like object into binary file object dst, one slice at a time.
+    Writes a standard (base64) Fernet token, or the undecoded token bytes with raw=True.
+    """
+    signing_key, encryption_key = _fernet_keys(key)
+    iv = os.urandom(16)
+    header = FERNET_VERSION + struct.pack(">Q", int(time.time())) + iv
+    encryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(iv)).encryptor()
+    mac = HMAC(signing_key, hashes.SHA256())
+    out = dst if raw else _Base64Writer(dst)
+
+    view = memoryview(data)
+    full = len(view) - len(view) % 16  # Whole blocks are encrypted without padding or copying
+    out.write(header)
+    mac.update(header)
+    for start in range(0, full, chunk_size):
+        block = encryptor.update(view[start:min(start + chunk_size, full)])
+        mac.update(block)
+        out.write(block)
+    padder = padding.PKCS7(128).padder()
+    block = encryptor.update(bytes(padder.update(view[full:])) + padder.finalize()) + encryptor.finalize()
+    mac.update(block)
+    out.write(block)
+    out.write(mac.finalize())
+    if not raw:
+        out.close()
+
+def decrypt_buffer(data, key, dst, chunk_size=BUFFER_CHUNK_SIZE):
+    """
+    Decrypt a raw or base64 Fernet token held in a bytes-like object (e.g. an mmap) into dst.
+    The HMAC is verified in a first pass, so nothing is written for a forged token.
+    """
+    signing_key, encryption_key = _fernet_keys(key)
+    length, chunks = _raw_token_chunks(data, chunk_size)
+    mac_start = length - _FERNET_MAC_SIZE
+    if mac_start <= _FERNET_HEADER_SIZE or (mac_start - _FERNET_HEADER_SIZE) % 16:
+        raise InvalidToken
+
+    # First pass: collect the header and trailing MAC, and authenticate everything before it
+    header, tag = b"", b""
+    mac = HMAC(signing_key, hashes.SHA256())
+    offset = 0
+    for chunk in chunks():
+        if offset < _FERNET_HEADER_SIZE:
+            header += bytes(chunk[:_FERNET_HEADER_SIZE - offset])
+        if offset < mac_start:
+            mac.update(chunk[:mac_start - offset])
+        if offset + len(chunk) > mac_start:
+            tag += bytes(chunk[max(mac_start - offset, 0):])
+        offset += len(chunk)
+    if header[:1] != FERNET_VERSION:
+        raise InvalidToken
+    try:
+        mac.verify(tag)
+    except InvalidSignature:
+        raise InvalidToken
+
+    # Second pass: decrypt the authenticated ciphertext slice by slice
+    decryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(header[9:])).decryptor()
+    unpadder = padding.PKCS7(128).unpadder()
+    for block in _slice_chunks(chunks(), _FERNET_HEADER_SIZE, mac_start):
+        dst.write(unpadder.update(decryptor.update(block)))
+    try:
+        dst.write(unpadder.update(decryptor.finalize()) + unpadder.finalize())
+    except ValueError:
+        raise InvalidToken
+
+# JSON-like documents: only string values are processed; keys, numbers, booleans and null are kept.
+# The document is walked iteratively (no recursion limit), the cipher is built once per call and
+# the string values are processed in batches on a thread pool (OpenSSL releases the GIL).
+JSON_BATCH_SIZE = 2048
+JSON_MAX_WORKERS = 4  # Per-value Python overhead holds the GIL, so more threads stop paying off
+
+def _string_slots(data):
+    # (container, key) for every string value inside nested dicts and lists
+    slots = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            continue
+        for k, v in items:
+            if isinstance(v, str):
+                slots.append((node, k))
+            elif isinstance(v, (dict, list)):
+                stack.append(v)
+    return slots
+
+def _throughput_stats(values, chars, seconds):
+    return {
+        "values": values,
+        "chars": chars,
+        "seconds": round(seconds, 3),
+        "values_per_second": round(values / seconds) if seconds else None,
+        "mb_per_second": round(chars / seconds / 1e6, 2) if seconds else None,
+    }
+
+def transform_json_values(data, func, max_workers=None, batch_size=JSON_BATCH_SIZE):
+    """
+    Replace every string value in data with func(value), in place.
+    Returns (data, stats); data is only a new object if it is itself a string.
+    stats holds the number of values, their total input size and the throughput.
+    """
+    start = time.perf_counter()
+    if isinstance(data, str):
+        slots, values = [], [data]
+    else:
+        slots = _string_slots(data)
+        values = [container[k] for container, k in slots]
+
+    batches = [values[i:i + batch_size] for i in range(0, len(values), batch_size)]
+    workers = min(max_workers or min(JSON_MAX_WORKERS, os.cpu_count() or 1), len(batches))
+    run_batch = lambda batch: [func(value) for value in batch]
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = [value for batch in executor.map(run_batch, batches) for value in batch]
+    else:
+        results = [value for batch in batches for value in run_batch(batch)]
+
+    if isinstance(data, str):
+        data = results[0]
+    for (container, k), value in zip(slots, results):
+        container[k] = value
+
+    return data, _throughput_stats(len(values), sum(len(value) for value in values), time.perf_counter() - start)
+
+def _value_encryptor(key, kdf=None):
+    # With a passphrase, every value carries the KDF header: "$cryptkd$<header>$<token>"
+    prefix = ""
+    if not is_fernet_key(key):
+        key, header = passphrase_key(key, kdf)
+        prefix = f"{KDF_VALUE_PREFIX}{base64.urlsafe_b64encode(header).decode('ascii')}$"
+    cipher_suite = Fernet(key)
+    return lambda value: prefix + cipher_suite.encrypt(value.encode('utf-8')).decode('utf-8')
+
+def _value_decryptor(key):
+    ciphers = {}  # KDF header -> Fernet, so each distinct salt is looked up once
+
+    def cipher_for(value):
+        if not value.startswith(KDF_VALUE_PREFIX):
+            header = None
+        else:
+            header, _, value = value[len(KDF_VALUE_PREFIX):].partition("$")
+        if header not in ciphers:
+            ciphers[header] = Fernet(key if header is None else key_from_header(key, base64.urlsafe_b64decode(header)))
+        return ciphers[header], value
+
+    def decrypt(value):
+        cipher_suite, token = cipher_for(value)
+        return cipher_suite.decrypt(token.encode('utf-8')).decode('utf-8')
+    return decrypt
+
+def value_rotator(old_key, new_key, kdf=None):
+    """Function that re-encrypts one JSON value from old_key to new_key."""
+    decrypt, encrypt = _value_decryptor(old_key), _value_encryptor(new_key, kdf)
+    return lambda value: encrypt(decrypt(value))
+
+def encrypt_json_values(data, key, max_workers=None, kdf=None):
+    """Encrypt every string value of a JSON document. Returns (data, stats)."""
+    return transform_json_values(data, _value_encryptor(key, kdf), max_workers)
+
+def decrypt_json_values(data, key, max_workers=None):
+    """Decrypt every string value of a JSON document. Returns (data, stats)."""
+    return transform_json_values(data, _value_decryptor(key), max_workers)
+
+# Streaming variant for JSON files too large to load: a small tokenizer copies the text through
+# unchanged and only replaces string values (not keys). Memory is one chunk plus the longest string.
+_JSON_STRUCTURE = re.compile(r'["{}\[\],:]')
+_JSON_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+JSON_STREAM_CHUNK_SIZE = 1024 * 1024
+
+def transform_json_stream(src, dst, func, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    """
+    Copy a JSON document from text file src to dst, replacing every string value with func(value).
+    Keys, whitespace, numbers and literals are written exactly as read. Returns stats.
+    Open both files with newline='' so line endings are kept too.
+    """
+    start = time.perf_counter()
+    stack = []           # Open containers, '{' or '['
+    expect_key = False   # The next string is an object key
+    values = chars = 0
+    buffer, pos = src.read(chunk_size), 0
+    while buffer:
+        match = _JSON_STRUCTURE.search(buffer, pos)
+        if match is None:
+            dst.write(buffer[pos:])
+            buffer, pos = src.read(chunk_size), 0
+            continue
+        dst.write(buffer[pos:match.start()])
+        char = match.group()
+
+        if char == '"':
+            string_start = match.start()
+            end = _JSON_STRING_END.match(buffer, string_start + 1)
+            while end is None:  # The string continues in the next chunk
+                more = src.read(chunk_size)
+                if not more:
+                    raise ValueError("Unterminated string in JSON document.")
+                buffer, string_start = buffer[string_start:] + more, 0
+                end = _JSON_STRING_END.match(buffer, 1)
+            token = buffer[string_start:end.end()]
+            pos = end.end()
+            if expect_key:
+                dst.write(token)
+            else:
+                value = json.loads(token)
+                dst.write(json.dumps(func(value), ensure_ascii=False))
+                values += 1
+                chars += len(value)
+            continue
+
+        dst.write(char)
+        pos = match.end()
+        if char in '{[':
+            stack.append(char)
+            expect_key = char == '{'
+        elif char in '}]':
+            if not stack or stack.pop() != ('{' if char == '}' else '['):
+                raise ValueError(f"Unbalanced '{char}' in JSON document.")
+            expect_key = False
+        elif char == ',':
+            expect_key = bool(stack) and stack[-1] == '{'
+        else:  # ':'
+            expect_key = False
+
+    if stack:
+        raise ValueError("Unexpected end of JSON document.")
+    return _throughput_stats(values, chars, time.perf_counter() - start)
+
+def encrypt_json_stream(src, dst, key, kdf=None):
+    """Stream a JSON document from src to dst with its string values encrypted. Returns stats."""
+    return transform_json_stream(src, dst, _value_encryptor(key, kdf))
+
+def decrypt_json_stream(src, dst, key):
+    """Stream a JSON document from src to dst with its string values decrypted. Returns stats."""
+    return transform_json_stream(src, dst, _value_decryptor(key))
+
 # For something like JSON file or similar structure
 def encrypt_kv_value_only(data, key):
-    if isinstance(data, str): # Base case
-        msg = encrypt_message(data, key)
-        return msg
-
-    elif isinstance(data, dict):
-        for k,v in data.items():
-            new_val = encrypt_kv_value_only(v, key)
-            if new_val:
-                data[k] = new_val
-    elif isinstance(data, list):
-        temp = []
-        for i in data:
-            temp.append(encrypt_kv_value_only(i, key))
-        if temp != [None]:
-            return temp
+    return encrypt_json_values(data, key)[0]
 
 # For something like JSON file or similar structure
 def decrypt_kv_value_only(data, key):
-    if isinstance(data, str): # Base case
-        msg = decrypt_message(data, key)
-        return msg
-
-    elif isinstance(data, dict):
-        for k,v in data.items():
-            new_val = decrypt_kv_value_only(v, key)
-            if new_val:
-                data[k] = new_val
-    elif isinstance(data, list):
-        temp = []
-        for i in data:
-            temp.append(decrypt_kv_value_only(i, key))
-        if temp != [None]:
-            return temp
+    return decrypt_json_values(data, key)[0]
+
+
+# Chunked stream format for files of any size:
+#   header  = magic "CRYPTIT" | version (1 byte) | segment size (4 bytes) | salt (16) | nonce prefix (7)
+#   segment = AES-256-GCM(plaintext segment) + 16-byte tag, nonce = prefix | index (4) | last flag (1)
+# The header is authenticated as associated data of every segment. The last-segment flag in the
+# nonce makes truncation or appended data fail authentication.
+STREAM_MAGIC = b"CRYPTIT"
+STREAM_VERSION = 1
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+MAX_SEGMENT_SIZE = 64 * 1024 * 1024
+_STREAM_HEADER = struct.Struct(">7sBI16s7s")
+_TAG_SIZE = 16
+
+def _read_full(src, size):
+    # file.read() may return short reads on pipes; keep reading until size bytes or EOF
+    data = src.read(size)
+    while 0 < len(data) < size:
+        more = src.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+def _stream_cipher(key, salt):
+    Fernet(key)  # Validates the key with Fernet's error message
+    raw_key = base64.urlsafe_b64decode(key)
+    derived = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"cryptit stream v1").derive(raw_key)
+    return AESGCM(derived)
+
+def _segment_nonce(prefix, index, last):
+    return prefix + struct.pack(">I", index) + (b"\x01" if last else b"\x00")
+
+def is_stream_encrypted(head):
+    """True if the given leading bytes start a chunked CryptIt stream."""
+    return head[:len(STREAM_MAGIC)] == STREAM_MAGIC
+
+def encrypt_stream(src, dst, key, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Encrypt binary file object src into dst, holding at most two segments in memory."""
+    header = _STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, segment_size, os.urandom(16), os.urandom(7))
+    _, _, _, salt, prefix = _STREAM_HEADER.unpack(header)
+    cipher = _stream_cipher(key, salt)
+    dst.write(header)
+
+    index = 0
+    chunk = _read_full(src, segment_size)
+    while True:
+        # Read ahead one segment to know whether the current one is the last
+        next_chunk = _read_full(src, segment_size) if len(chunk) == segment_size else b""
+        last = not next_chunk
+        dst.write(cipher.encrypt(_segment_nonce(prefix, index, last), chunk, header))
+        if last:
+            return index + 1
+        chunk = next_chunk
+        index += 1
+
+def iter_decrypt_stream(src, key):
+    """Yield the decrypted segments of a chunked stream read from binary file object src."""
+    header = _read_full(src, _STREAM_HEADER.size)
+    if len(header) < _STREAM_HEADER.size or not is_stream_encrypted(header):
+        raise ValueError("Not a CryptIt chunked stream.")
+    _, version, segment_size, salt, prefix = _STREAM_HEADER.unpack(header)
+    if version != STREAM_VERSION:
+        raise ValueError(f"Unsupported CryptIt stream version: {version}")
+    if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+        raise ValueError(f"Invalid segment size in header: {segment_size}")
+    cipher = _stream_cipher(key, salt)
+
+    index = 0
+    encrypted_size = segment_size + _TAG_SIZE
+    chunk = _read_full(src, encrypted_size)
+    while True:
+        next_chunk = _read_full(src, encrypted_size) if len(chunk) == encrypted_size else b""
+        last = not next_chunk
+        try:
+            yield cipher.decrypt(_segment_nonce(prefix, index, last), chunk, header)
+        except InvalidTag:
+            raise ValueError(f"Segment {index} failed authentication: wrong key, or the file is corrupted or truncated.")
+        if last:
+            return
+        chunk = next_chunk
+        index += 1
+
+def decrypt_stream(src, dst, key):
+    """Decrypt a chunked stream from binary file object src into dst, segment by segment."""
+    count = 0
+    for segment in iter_decrypt_stream(src, key):
+        dst.write(segment)
+        count += 1
+    return count
+
+class _SegmentReader:
+    # Minimal binary reader over an iterator of byte strings, so encrypt_stream can consume segments
+    def __init__(self, segments):
+        self.segments = segments
+        self.buffer = b""
+
+    def read(self, size):
+        while len(self.buffer) < size:
+            segment = next(self.segments, None)
+            if segment is None:
+                break
+            self.buffer += segment
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
 
+def rekey_stream(src, dst, old_key, new_key, segment_size=DEFAULT_SEGMENT_SIZE):
+    """
+    Re-encrypt a chunked stream under new_key without writing plaintext anywhere.
+    Every segment is authenticated with old_key before its re-encrypted form is written.
+    """
+    return encrypt_stream(_SegmentReader(iter_decrypt_stream(src, old_key)), dst, new_key, segment_size)
 
+def rotate_token(token, old_key, new_key):
+    """Re-encrypt a base64 Fernet token under new_key (a token already under new_key is accepted too)."""
+    return MultiFernet([Fernet(new_key), Fernet(old_key)]).rotate(token)
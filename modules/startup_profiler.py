@@ -0,0 +1,130 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from PySide6.QtCore import QObject, QEvent, QTimer
+from config.logging_config import get_logger, LOG_DIR
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+logger = get_logger(__name__)
+
+
+def get_peak_rss_kb():
+    """Peak resident set size of the process in KB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes, Linux KB
+
+
+class StartupProfiler:
+    """
+    Record wall time and memory for named startup phases.
+    Does nothing until enable() is called, so phases can stay in production code.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reported = False
+        self.phases = []
+        self._start = None
+        self._depth = 0
+
+    def enable(self):
+        """Start profiling. Call as early as possible."""
+        self.enabled = True
+        self._start = time.perf_counter()
+        tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as a named phase."""
+        if not self.enabled:
+            yield
+            return
+
+        alloc_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            end = time.perf_counter()
+            entry = {
+                "phase": name,
+                "depth": self._depth,
+                "start_ms": round((start - self._start) * 1000, 2),
+                "wall_ms": round((end - start) * 1000, 2),
+                "python_alloc_kb": round((tracemalloc.get_traced_memory()[0] - alloc_before) / 1024, 1),
+                "peak_rss_kb": get_peak_rss_kb(),
+            }
+            self.phases.append(entry)
+            if self.reported:
+                # Late phases (e.g. lazily constructed apps) are logged as they happen
+                logger.info(f"[startup-profile] {self.format_entry(entry)}")
+
+    def mark(self, name):
+        """Record an instant event, such as the first paint."""
+        if not self.enabled:
+            return
+        self.phases.append({
+            "phase": name,
+            "depth": self._depth,
+            "start_ms": round((time.perf_counter() - self._start) * 1000, 2),
+            "wall_ms": 0.0,
+            "python_alloc_kb": 0.0,
+            "peak_rss_kb": get_peak_rss_kb(),
+        })
+
+    @staticmethod
+    def format_entry(entry):
+        indent = "  " * entry["depth"]
+        rss = f"{entry['peak_rss_kb']} KB" if entry["peak_rss_kb"] is not None else "n/a"
+        return (f"{indent}{entry['phase']}: {entry['wall_ms']:.1f} ms "
+                f"(at {entry['start_ms']:.1f} ms, py alloc {entry['python_alloc_kb']:+.1f} KB, peak RSS {rss})")
+
+    def report(self, output_path=None):
+        """Log the recorded phases and write them to a JSON file. Returns the file path."""
+        if not self.enabled or self.reported:
+            return None
+        self.reported = True
+
+        # Phases are appended when they end; sort by start time for a readable timeline
+        phases = sorted(self.phases, key=lambda entry: entry["start_ms"])
+        logger.info("Startup profile:")
+        for entry in phases:
+            logger.info(f"[startup-profile] {self.format_entry(entry)}")
+
+        if output_path is None:
+            output_path = LOG_DIR / f"startup_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output_path, "w", encoding="utf-8") as file:
+            json.dump({"created": datetime.now().isoformat(), "phases": phases}, file, indent=4)
+        logger.info(f"Startup profile written to: {output_path}")
+        return output_path
+
+
+class FirstPaintWatcher(QObject):
+    """Event filter that marks the first paint of a widget and then writes the report."""
+
+    def __init__(self, widget, profiler):
+        super().__init__(widget)
+        self.profiler = profiler
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            self.profiler.mark("first paint")
+            QTimer.singleShot(0, self.profiler.report)
+        return False
+
+
+# Process-wide profiler used by main.py and the app registry
+profiler = StartupProfiler()
@@ -1,146 +1,367 @@
-from pdfrw import PdfReader, PdfWriter, PageMerge, PdfDict, PdfName
+import pdfrw
+from pdfrw import PdfWriter
 import os
-import pdfplumber
-import pandas as pd
+import multiprocessing
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from modules.os import lookup_file_record
+from modules.pdf_layout import SheetLayout, SheetBuilder
+from modules.pdf_backend import get_backend, page_count
+from modules.pdf_writer import PdfFragmentWriter, unload_page, STREAMING_SUPPORTED, PDFRW_STREAMING_VERSION
 from config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
-def create_dynamic_pages_per_sheet(input_pdf_path, output_pdf_path, pages_per_sheet=4, margin=5):
+DEFAULT_PAGES_PER_CHUNK = 25  # Page range handed to one worker when splitting a large PDF
+MIN_SHEETS_PER_RANGE = 50     # N-up sheets worth starting a worker process for
+
+
+def get_worker_count(max_workers=None):
+    """Number of worker processes: max_workers if given, else AIOPU_WORKERS, else the CPU count."""
+    if max_workers:
+        return max(1, int(max_workers))
+    return max(1, int(os.getenv("AIOPU_WORKERS", 0)) or os.cpu_count() or 1)
+
+
+def _call_safely(func, item):
+    """Run func(item) and return (result, error message) so worker failures never abort the pool."""
+    try:
+        return func(item), None
+    except Exception as e:
+        logger.error(f"Failed to process {item}: {e}", exc_info=True)
+        return None, str(e)
+
+
+def map_serial(func, items):
+    """Yield (item, result, error) for every item, computed one after another in this process."""
+    for item in items:
+        result, error = _call_safely(func, item)
+        yield item, result, error
+
+
+def map_in_process_pool(func, items, max_workers=None):
+    """
+    Yield (item, result, error) for every item in input order, computing func(item) in worker processes.
+    func must be picklable (a module-level function or a functools.partial of one).
+    Items are submitted through a bounded window, so generators of any length are fine.
+    Closing the generator early cancels the work that has not started yet.
+    """
+    workers = get_worker_count(max_workers)
+    if workers == 1:
+        yield from map_serial(func, items)
+        return
+
+    # spawn (the Windows default) everywhere: forking a process that runs Qt threads is not safe
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(_call_safely, func, item)))
+            if len(pending) >= workers * 2:
+                item, future = pending.popleft()
+                yield (item, *future.result())
+        while pending:
+            item, future = pending.popleft()
+            yield (item, *future.result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def get_pages_per_sheet_output_path(input_pdf_path, pages_per_sheet, output_dir=None):
+    """Default output path for create_dynamic_pages_per_sheet: <name>_<n>pages_per_sheet.pdf."""
+    stem = os.path.splitext(os.path.basename(input_pdf_path))[0]
+    output_dir = output_dir if output_dir else os.path.dirname(input_pdf_path)
+    return os.path.join(output_dir, f"{stem}_{pages_per_sheet}pages_per_sheet.pdf")
+
+
+def create_pages_per_sheet_file(input_pdf_path, pages_per_sheet=4, margin=5, output_dir=None, max_workers=1,
+                                **options):
+    """
+    Run create_dynamic_pages_per_sheet with the default output path and return that path.
+    options (sheet_size, orientation, grid, order, optimize, object_streams) are passed on.
+    """
+    output_pdf_path = get_pages_per_sheet_output_path(input_pdf_path, pages_per_sheet, output_dir)
+    logger.info(f"Creating {pages_per_sheet}-page-per-sheet PDF for {input_pdf_path}. Output: {output_pdf_path}")
+    create_dynamic_pages_per_sheet(input_pdf_path, output_pdf_path, pages_per_sheet, margin, max_workers=max_workers,
+                                   **options)
+    return output_pdf_path
+
+
+def read_pdf(pdf_path):
+    """Open a PDF with the backend used to write imposed pages (pdfrw), for impose_pages."""
+    return get_backend("write").open(pdf_path)
+
+
+def impose_pages(reader, writer, layout, start=0, stop=None, release=False):
+    """
+    Add the sheets start:stop that layout (a SheetLayout) makes of reader's pages to writer
+    (a pdfrw PdfWriter or a StreamingPdfWriter).
+    With release, the source pages are unloaded once their sheet is written (streaming writers only).
+    """
+    pages = reader.pages
+    builder = SheetBuilder(layout)
+    for sheet in layout.sheets(len(pages))[start:stop]:
+        placed = [pages[index] if index is not None else None for index in sheet]
+        writer.addpage(builder.build(placed))
+        if release:
+            for src_page in placed:
+                if src_page is not None:
+                    unload_page(reader, src_page)
+
+
+def _impose_range_task(task):
+    """Process-pool task: impose one sheet range of a PDF into a fragment file and return the fragment."""
+    input_pdf_path, fragment_path, start, stop, layout, optimize = task
+    reader = read_pdf(input_pdf_path)
+    with PdfFragmentWriter(fragment_path, compress=optimize, deduplicate=optimize) as writer:
+        impose_pages(reader, writer, layout, start, stop, release=True)
+    return writer.fragment
+
+
+def create_dynamic_pages_per_sheet(input_pdf_path, output_pdf_path, pages_per_sheet=4, margin=5, streaming=True,
+                                   max_workers=1, sheet_size="A4", orientation="landscape", grid=None, order="grid",
+                                   optimize=True, object_streams=True):
     """
     Create a new PDF where each sheet contains a specified number of pages
-    of the input PDF, dynamically arranged and scaled without cropping.
+    of the input PDF, arranged in a grid and scaled without cropping.
 
     Args:
         input_pdf_path (str): Path to the input PDF file.
         output_pdf_path (str): Path to the output PDF file.
         pages_per_sheet (int): Number of pages to fit per sheet (default is 4).
-        margin (int): Margin between pages (default is 5 points).
+        margin (int): Margin around each page (default is 5 points).
+        streaming (bool): Write each sheet as soon as it is built and release its source pages,
+            so memory stays at a few sheets whatever the page count (default). False builds the
+            whole output in memory and writes it with pdfrw at the end.
+        max_workers (int): Worker processes for large PDFs, which are imposed in sheet ranges and
+            reassembled in order into the same file a single process writes. 1 (default) runs in
+            this process, None uses get_worker_count(). Requires streaming.
+        sheet_size (str | tuple): A SHEET_SIZES name (default A4) or (width, height) in points.
+        orientation (str): "landscape" (default) or "portrait".
+        grid (tuple): (columns, rows); by default as square as pages_per_sheet allows.
+        order (str): "grid" (default) or "booklet" for 2-up sheets in saddle-stitch order.
+        optimize (bool): Compress page content and write identical fonts and images of different
+            source pages once (default). Source content is usually compressed already, so this
+            mostly pays off for sources that repeat the same fonts or images.
+        object_streams (bool): Pack the small objects (pages, dictionaries) into compressed
+            object streams (default). This is what makes most output smaller than its source;
+            the file is PDF 1.5, which viewers older than Acrobat 6 cannot read. Their text (a few
+            hundred bytes per sheet) is kept in memory until the file is closed. Requires streaming.
+
+    Streaming relies on pdfrw internals; with a pdfrw version other than the one it was checked
+    against, the whole output is built in memory and written by pdfrw instead (see STREAMING_SUPPORTED).
+
+    Raises:
+        ValueError: If the layout options do not describe a usable layout.
     """
-    # Load the input PDF
-    reader = PdfReader(input_pdf_path)
-    writer = PdfWriter()
+    layout = SheetLayout(pages_per_sheet, sheet_size, orientation, grid, margin, order)
+    if streaming and not STREAMING_SUPPORTED:
+        logger.warning(f"Streaming PDF output needs pdfrw {PDFRW_STREAMING_VERSION} (found {pdfrw.__version__}); "
+                       f"writing {output_pdf_path} with pdfrw's PdfWriter instead.")
+        streaming = False
+    if not streaming:
+        writer = PdfWriter(compress=optimize)
+        impose_pages(read_pdf(input_pdf_path), writer, layout)
+        writer.write(output_pdf_path)
+        return
 
-    # Dimensions for a Letter-sized landscape page
-    page_width = 842  # Letter width in points (landscape)
-    page_height = 595  # Letter height in points (landscape)
+    sheets = layout.sheet_count(count_pdf_pages(input_pdf_path))
+    ranges = min(get_worker_count(max_workers), sheets // MIN_SHEETS_PER_RANGE)
+    with get_backend("write").writer(output_pdf_path, compress=optimize, deduplicate=optimize,
+                                     object_streams=object_streams) as writer:
+        if ranges <= 1:
+            impose_pages(read_pdf(input_pdf_path), writer, layout, release=True)
+        else:
+            _impose_ranges(input_pdf_path, writer, layout, sheets, ranges, optimize, max_workers)
+    logger.info(f"Wrote {output_pdf_path} from {os.path.getsize(input_pdf_path) / (1024 * 1024):.1f} MB of input: "
+                f"{writer.stats.describe()}")
 
-    # Determine grid layout
-    rows = int(pages_per_sheet ** 0.5)
-    cols = pages_per_sheet // rows
 
-    quadrant_width = page_width / cols
-    quadrant_height = page_height / rows
+def _impose_ranges(input_pdf_path, writer, layout, sheets, ranges, optimize, max_workers):
+    """Impose the sheets in ranges on worker processes and add them to writer in order."""
+    sheets_per_range = -(-sheets // ranges)
+    with tempfile.TemporaryDirectory(prefix="nup_", dir=os.path.dirname(os.path.abspath(writer.file.name))) as temp_dir:
+        tasks = [(input_pdf_path, os.path.join(temp_dir, f"{index}.fragment"), start, start + sheets_per_range,
+                  layout, optimize)
+                 for index, start in enumerate(range(0, sheets, sheets_per_range))]
+        logger.info(f"Imposing {input_pdf_path} in {len(tasks)} sheet ranges.")
+        for task, fragment, error in map_in_process_pool(_impose_range_task, tasks, max_workers):
+            if error:
+                raise RuntimeError(f"Failed to impose sheets {task[2] + 1}-{min(task[3], sheets)} of "
+                                   f"{input_pdf_path}: {error}")
+            writer.add_fragment(fragment)
 
-    for i in range(0, len(reader.pages), pages_per_sheet):
-        # Create a new blank page
-        new_page = PdfDict(
-            Type=PdfName.Page,
-            MediaBox=[0, 0, page_width, page_height],
-            Resources=PdfDict(),
-            Contents=[]
-        )
 
-        # Create a PageMerge object for the blank page
-        page_merger = PageMerge(new_page)
+def get_tables_output_path(pdf_paths, combine_files=True):
+    """
+    Default output for extract_tables_from_pdfs: combined_output.xlsx or the directory of the first PDF.
+    The first path may also be a dropped folder, which is then used itself.
+    """
+    first_pdf_directory = pdf_paths[0] if os.path.isdir(pdf_paths[0]) else os.path.dirname(pdf_paths[0])
+    if combine_files:
+        return os.path.join(first_pdf_directory, "combined_output.xlsx")
+    return first_pdf_directory  # Directory for individual files
+
+
+def extract_tables_from_pdf(pdf_path, combine_tables=True, pages=None):
+    """
+    Extract the tables of a single PDF.
+
+    :param pdf_path: PDF file path to process
+    :param combine_tables: If True, combines all tables on the same page into one DataFrame.
+    :param pages: Optional list of 1-based page numbers to process (default: all pages).
+    :return: Dict of sheet name (e.g. "Page_1" or "Page_1_Table_2") to DataFrame
+    """
+    import pdfplumber
+    import pandas as pd
+
+    file_results = {}  # Store tables for the current PDF
+    logger.info(f"Processing file: {pdf_path}" + (f" (pages {pages[0]}-{pages[-1]})" if pages else ""))
+
+    with pdfplumber.open(pdf_path, pages=pages) as pdf:
+        total_pages = len(pdf.pages)  # Get total number of pages
+        logger.info(f"Total pages in the file: {total_pages}")  # Log the total pages
+
+        for page in pdf.pages:
+            page_number = page.page_number
+            tables = page.extract_tables()
+            if tables:
+                logger.info(f"Found {len(tables)} table(s) on page {page_number}.")
+                if combine_tables:
+                    combined_table = pd.DataFrame()
+                    for table in tables:
+                        df = pd.DataFrame(table)
+                        combined_table = pd.concat([combined_table, df], ignore_index=True)
+                    file_results[f"Page_{page_number}"] = combined_table
+                else:
+                    for j, table in enumerate(tables):
+                        df = pd.DataFrame(table)
+                        file_results[f"Page_{page_number}_Table_{j + 1}"] = df
+            else:
+                logger.info(f"No tables found on page {page_number}.")
+
+    return file_results
+
+
+def _extract_tables_task(task):
+    """Process-pool task: (pdf_path, combine_tables, pages) -> tables of that page range."""
+    pdf_path, combine_tables, pages = task
+    return extract_tables_from_pdf(pdf_path, combine_tables, pages)
+
+
+def count_pdf_pages(pdf_path):
+    """
+    Number of pages in a PDF: from the file index if it already knows the unchanged file (it is not
+    indexed here, which would hash it), else read with the fastest PDF backend.
+    """
+    record = lookup_file_record(pdf_path)
+    if record is not None and record.page_count is not None:
+        return record.page_count
+    return page_count(pdf_path)
+
+
+def _extract_tables_by_file(pdf_paths, combine_tables, max_workers, pages_per_chunk):
+    """
+    {pdf_path: tables} for several PDFs. With max_workers other than 1, files are spread over worker
+    processes and PDFs longer than pages_per_chunk are split into page ranges; tables keep the page order.
+    """
+    if get_worker_count(max_workers) == 1:
+        tasks = [(pdf_path, combine_tables, None) for pdf_path in pdf_paths]
+    else:
+        tasks = []
+        for pdf_path in pdf_paths:
+            total_pages = count_pdf_pages(pdf_path)
+            for start in range(1, total_pages + 1, pages_per_chunk):
+                pages = list(range(start, min(start + pages_per_chunk, total_pages + 1)))
+                tasks.append((pdf_path, combine_tables, pages))
+
+    # Chunks come back in submission order, so merging them keeps the page order
+    tables_by_file = {pdf_path: {} for pdf_path in pdf_paths}
+    for task, chunk_results, error in map_in_process_pool(_extract_tables_task, tasks, max_workers):
+        if error:
+            raise RuntimeError(f"Failed to extract tables from {task[0]}: {error}")
+        tables_by_file[task[0]].update(chunk_results)
+    return tables_by_file
 
-        # Process up to pages_per_sheet pages from the original PDF
-        for j in range(pages_per_sheet):
-            if i + j < len(reader.pages):  # Ensure the page exists
-                src_page = reader.pages[i + j]
 
-                # Rotate the source page upright (if needed)
-                src_page.Rotate = (int(src_page.inheritable.Rotate or 0)) % 360
+def extract_tables_in_page_ranges(pdf_path, combine_tables=True, max_workers=None,
+                                  pages_per_chunk=DEFAULT_PAGES_PER_CHUNK):
+    """Tables of one PDF like extract_tables_from_pdf, with its page ranges spread over worker processes."""
+    return _extract_tables_by_file([pdf_path], combine_tables, max_workers, pages_per_chunk)[pdf_path]
 
-                # Calculate position
-                row = j // cols
-                col = j % cols
-                x_pos = col * quadrant_width + margin
-                y_pos = page_height - ((row + 1) * quadrant_height) + margin
 
-                # Scale to fit in the quadrant
-                added_page = page_merger.add(src_page)
-                scale_x = (quadrant_width - 2 * margin) / added_page[-1].w
-                scale_y = (quadrant_height - 2 * margin) / added_page[-1].h
-                scale = min(scale_x, scale_y)  # Preserve aspect ratio
+def extract_tables_from_pdf_to_excel(pdf_path, output_dir, combine_tables=True, max_workers=1):
+    """
+    Extract the tables of one PDF into <output_dir>/<name>.xlsx and return that path.
+    With max_workers other than 1, its page ranges are spread over worker processes.
+    """
+    output_path = os.path.join(output_dir, f"{get_pdf_name(pdf_path)}.xlsx")
+    save_file_tables(extract_tables_in_page_ranges(pdf_path, combine_tables, max_workers), output_path)
+    return output_path
+
+
+def save_file_tables(file_results, output_path):
+    """Save the tables of one PDF (from extract_tables_from_pdf) to an Excel file."""
+    import pandas as pd
+    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+        for sheet_name, table_df in file_results.items():
+            table_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
+    logger.info(f"Saved individual file to: {output_path}")
 
-                added_page[-1].scale(scale)
-                added_page[-1].x = x_pos
-                added_page[-1].y = y_pos
 
-        # Render the merged page and add it to the writer
-        writer.addpage(page_merger.render())
+def save_combined_tables(results, output_path):
+    """Save the tables of several PDFs ({pdf name: file_results}) into a single Excel file."""
+    import pandas as pd
+    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+        for pdf_name, file_results in results.items():
+            for sheet_name, table_df in file_results.items():
+                sheet_name = f"{pdf_name}_{sheet_name}"[:31]  # Ensure sheet name is <= 31 chars
+                table_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
+    logger.info(f"Combined results saved to: {output_path}")
 
-    # Save the final PDF
-    writer.write(output_pdf_path)
 
+def get_pdf_name(pdf_path):
+    """File name without extension, used for output names and sheet prefixes."""
+    return os.path.basename(pdf_path).rsplit('.', 1)[0]
 
-def extract_tables_from_pdfs(pdf_paths, output_path=None, combine_files=True, combine_tables=True):
+
+def extract_tables_from_pdfs(pdf_paths, output_path=None, combine_files=True, combine_tables=True,
+                             max_workers=1, pages_per_chunk=DEFAULT_PAGES_PER_CHUNK):
     """
     Extracts tables from one or more PDFs and saves them to Excel file(s).
+    With max_workers other than 1, files are spread over worker processes and PDFs longer than
+    pages_per_chunk are split into page ranges. Results keep the input and page order.
 
     :param pdf_paths: List of PDF file paths to process
     :param output_path: Path to save the result(s). Can be a file or directory. If not specified, uses the same directory as the input file(s).
     :param combine_files: If True, combines results into a single Excel file. Otherwise, saves files separately.
     :param combine_tables: If True, combines all tables on the same page into one sheet. Otherwise, saves each table as a separate sheet.
+    :param max_workers: Number of worker processes. 1 runs in this process, None uses get_worker_count().
+    :param pages_per_chunk: Maximum number of pages of one PDF handed to a single worker.
     """
     try:
         # If output_path is not specified, use the same directory as the first input PDF
         if not output_path:
-            first_pdf_directory = os.path.dirname(pdf_paths[0])
-            if combine_files:
-                output_path = os.path.join(first_pdf_directory, "combined_output.xlsx")
-            else:
-                output_path = first_pdf_directory  # Directory for individual files
+            output_path = get_tables_output_path(pdf_paths, combine_files)
             logger.info(f"No output path specified. Using default: {output_path}")
 
         results = {}  # Dictionary to store all results for combined output
         logger.info("Starting PDF table extraction process.")
 
-        for pdf_path in pdf_paths:
-            file_name = os.path.basename(pdf_path).rsplit('.', 1)[0]  # Get the file name without extension
-            file_results = {}  # Store tables for the current PDF
-            logger.info(f"Processing file: {pdf_path}")
-
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)  # Get total number of pages
-                logger.info(f"Total pages in the file: {total_pages}")  # Log the total pages
-
-                for i, page in enumerate(pdf.pages):
-                    tables = page.extract_tables()
-                    if tables:
-                        logger.info(f"Found {len(tables)} table(s) on page {i + 1}.")
-                        if combine_tables:
-                            combined_table = pd.DataFrame()
-                            for table in tables:
-                                df = pd.DataFrame(table)
-                                combined_table = pd.concat([combined_table, df], ignore_index=True)
-                            file_results[f"Page_{i + 1}"] = combined_table
-                        else:
-                            for j, table in enumerate(tables):
-                                df = pd.DataFrame(table)
-                                file_results[f"Page_{i + 1}_Table_{j + 1}"] = df
-                    else:
-                        logger.info(f"No tables found on page {i + 1}.")
+        tables_by_file = _extract_tables_by_file(pdf_paths, combine_tables, max_workers, pages_per_chunk)
+        for pdf_path, file_results in tables_by_file.items():
+            file_name = get_pdf_name(pdf_path)  # Get the file name without extension
 
             if combine_files:
                 results[file_name] = file_results
             else:
                 # Save individual file results
-                individual_output = os.path.join(output_path, f"{file_name}.xlsx")
-                with pd.ExcelWriter(individual_output, engine="openpyxl") as writer:
-                    for sheet_name, table_df in file_results.items():
-                        table_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
-                logger.info(f"Saved individual file to: {individual_output}")
+                save_file_tables(file_results, os.path.join(output_path, f"{file_name}.xlsx"))
 
         if combine_files:
             # Save all results into a single file
-            with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-                for pdf_name, file_results in results.items():
-                    for sheet_name, table_df in file_results.items():
-                        sheet_name = f"{pdf_name}_{sheet_name}"[:31]  # Ensure sheet name is <= 31 chars
-                        table_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
-            logger.info(f"Combined results saved to: {output_path}")
+            save_combined_tables(results, output_path)
 
         logger.info("PDF table extraction process completed successfully.")
 
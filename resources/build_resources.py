@@ -0,0 +1,27 @@
+"""
+Compile resources.qrc into a binary resources.rcc that Qt memory-maps at startup.
+
+Usage: python resources/build_resources.py
+
+Also regenerates the resources.py module, which is kept as a fallback
+for when the .rcc file is missing.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+RESOURCES_DIR = Path(__file__).resolve().parent
+QRC_PATH = RESOURCES_DIR / "resources.qrc"
+RCC_PATH = RESOURCES_DIR / "resources.rcc"
+MODULE_PATH = RESOURCES_DIR / "resources.py"
+
+
+def build(rcc_tool="pyside6-rcc"):
+    subprocess.run([rcc_tool, "--binary", str(QRC_PATH), "-o", str(RCC_PATH)], check=True, cwd=RESOURCES_DIR)
+    print(f"Built {RCC_PATH}")
+    subprocess.run([rcc_tool, str(QRC_PATH), "-o", str(MODULE_PATH)], check=True, cwd=RESOURCES_DIR)
+    print(f"Built {MODULE_PATH}")
+
+
+if __name__ == "__main__":
+    build(*sys.argv[1:])
@@ -0,0 +1,22 @@
+from pathlib import Path
+from PySide6.QtCore import QResource
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+RCC_PATH = Path(__file__).resolve().with_name("resources.rcc")
+
+
+def register_resources():
+    """
+    Make the ':/images/...' and ':/fonts/...' resources available.
+    Prefers the binary .rcc (memory-mapped by Qt) and falls back to importing
+    the compiled resources.py module. Returns which source was used.
+    """
+    if RCC_PATH.exists() and QResource.registerResource(str(RCC_PATH)):
+        logger.info(f"Registered binary resources: {RCC_PATH}")
+        return "rcc"
+
+    logger.warning(f"Binary resources not available at {RCC_PATH}. Falling back to resources.py.")
+    import resources.resources  # Registers its data on import
+    return "module"